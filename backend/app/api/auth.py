@@ -1,6 +1,8 @@
 """Authentication endpoint for frontend password protection."""
 
+import asyncio
 import hashlib
+import heapq
 import secrets
 import time
 from fastapi import APIRouter, HTTPException, Security, status
@@ -11,9 +13,14 @@ from ..config import get_settings
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-# Session store: token -> {user_id, created_at}
-_sessions: dict[str, dict] = {}
+# Session store: token -> {user_id, expires_at} (monotonic deadline),
+# sharded so each dict stays small and resizes independently
+_SESSION_SHARD_COUNT = 16
+_SHARDS: list[dict[str, dict]] = [{} for _ in range(_SESSION_SHARD_COUNT)]
+# Min-heap of (expires_at, token) so sweeps only visit expired sessions
+_expiry_heap: list[tuple[float, str]] = []
 SESSION_DURATION = 24 * 60 * 60  # 24 hours in seconds
+SESSION_CLEANUP_INTERVAL = 60  # Background sweep interval in seconds
 
 # Header for user token
 USER_TOKEN_HEADER = APIKeyHeader(name="X-User-Token", auto_error=False)
@@ -38,13 +45,57 @@ class ValidateResponse(BaseModel):
     valid: bool
 
 
+# Prebuilt immutable responses/errors, reused instead of rebuilt per request.
+# Exceptions are raised via .with_traceback(None) so tracebacks don't pile up.
+INVALID_PASSWORD_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid password"
+)
+MISSING_USER_TOKEN_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Missing user token. Include X-User-Token header.",
+)
+INVALID_USER_TOKEN_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid or expired user token. Please login again.",
+)
+VALIDATE_TRUE = ValidateResponse(valid=True)
+VALIDATE_FALSE = ValidateResponse(valid=False)
+LOGOUT_OK = {"success": True, "message": "Logged out"}
+
+
+def _shard(token: str) -> dict[str, dict]:
+    """Return the session shard holding the given token."""
+    return _SHARDS[hash(token) & (_SESSION_SHARD_COUNT - 1)]
+
+
 def _cleanup_expired_sessions():
-    """Remove expired sessions."""
-    current_time = time.time()
-    expired = [token for token, data in _sessions.items()
-               if current_time - data["created_at"] > SESSION_DURATION]
-    for token in expired:
-        del _sessions[token]
+    """Remove expired sessions. Run periodically from the app lifespan."""
+    now = time.monotonic()
+    while _expiry_heap and _expiry_heap[0][0] < now:
+        expires_at, token = heapq.heappop(_expiry_heap)
+        shard = _shard(token)
+        session = shard.get(token)
+        # Skip stale entries for sessions already removed or refreshed
+        if session and session["expires_at"] == expires_at:
+            del shard[token]
+
+
+def _get_session(token: str) -> dict | None:
+    """Look up a session, evicting it if it has expired."""
+    shard = _shard(token)
+    session = shard.get(token)
+    if session and session["expires_at"] < time.monotonic():
+        del shard[token]
+        session = None
+    return session
+
+
+async def cleanup_sessions_periodically() -> None:
+    """Sweep expired sessions on a fixed interval until cancelled."""
+    while True:
+        await asyncio.sleep(SESSION_CLEANUP_INTERVAL)
+        _cleanup_expired_sessions()
 
 
 def _generate_user_id() -> str:
@@ -59,16 +110,20 @@ async def login(request: LoginRequest) -> LoginResponse:
     """
     settings = get_settings()
 
-    if request.password == settings.app_password:
+    # Constant-time compare; bytes so non-ASCII passwords don't raise
+    if secrets.compare_digest(
+        request.password.encode(), settings.app_password.encode()
+    ):
         # Generate secure token and user ID
         token = secrets.token_urlsafe(32)
         user_id = _generate_user_id()
 
-        _sessions[token] = {
+        expires_at = time.monotonic() + SESSION_DURATION
+        _shard(token)[token] = {
             "user_id": user_id,
-            "created_at": time.time()
+            "expires_at": expires_at,
         }
-        _cleanup_expired_sessions()
+        heapq.heappush(_expiry_heap, (expires_at, token))
 
         return LoginResponse(
             success=True,
@@ -77,10 +132,7 @@ async def login(request: LoginRequest) -> LoginResponse:
             message="Login successful"
         )
     else:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid password"
-        )
+        raise INVALID_PASSWORD_EXC.with_traceback(None)
 
 
 @router.post("/validate", response_model=ValidateResponse)
@@ -88,12 +140,10 @@ async def validate_token(request: ValidateRequest) -> ValidateResponse:
     """
     Validate a session token.
     """
-    _cleanup_expired_sessions()
-
-    if request.token in _sessions:
-        return ValidateResponse(valid=True)
+    if _get_session(request.token) is not None:
+        return VALIDATE_TRUE
 
-    return ValidateResponse(valid=False)
+    return VALIDATE_FALSE
 
 
 @router.post("/logout")
@@ -101,10 +151,9 @@ async def logout(request: ValidateRequest) -> dict:
     """
     Invalidate a session token.
     """
-    if request.token in _sessions:
-        del _sessions[request.token]
+    _shard(request.token).pop(request.token, None)
 
-    return {"success": True, "message": "Logged out"}
+    return LOGOUT_OK
 
 
 async def get_user_id_from_token(
@@ -119,19 +168,11 @@ async def get_user_id_from_token(
     Raises:
         HTTPException: If token is missing or invalid
     """
-    _cleanup_expired_sessions()
-
     if user_token is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Missing user token. Include X-User-Token header.",
-        )
+        raise MISSING_USER_TOKEN_EXC.with_traceback(None)
 
-    session = _sessions.get(user_token)
+    session = _get_session(user_token)
     if session is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired user token. Please login again.",
-        )
+        raise INVALID_USER_TOKEN_EXC.with_traceback(None)
 
     return session["user_id"]
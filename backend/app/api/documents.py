@@ -1,13 +1,27 @@
 """Document management endpoints."""
 
+import asyncio
+import hashlib
 import time
-from datetime import datetime
-
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
 
 from ..auth import verify_api_key
 from .auth import get_user_id_from_token
 from ..config import get_settings
+from ..models.documents import Chunk
 from ..models.responses import (
     DocumentListResponse,
     DocumentSummary,
@@ -20,8 +34,107 @@ from ..models.responses import (
 from ..services.pdf_processor import get_pdf_processor
 from ..services.embedding_service import get_embedding_service
 from ..services.vector_store import get_vector_store
+from ..utils.timestamps import utcnow_cached
+
+router = APIRouter(
+    prefix="/documents",
+    tags=["documents"],
+    dependencies=[Depends(verify_api_key)],
+)
+
+# Chunks embedded per batch when indexing an upload
+EMBED_BATCH_SIZE = 32
+
+
+def _document_list_etag(stored_docs) -> str:
+    """Build a weak ETag from every field a document listing returns."""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc in stored_docs:
+        digest.update(
+            f"{doc.id}\x1f{doc.title}\x1f{doc.page_count}\x1f{doc.chunk_count}"
+            f"\x1f{doc.file_size_bytes}\x1f{doc.uploaded_at.isoformat()}\x1e".encode()
+        )
+    return f'W/"{digest.hexdigest()}"'
+
 
-router = APIRouter(prefix="/documents", tags=["documents"])
+def _preview(text: str) -> str:
+    """Build a chunk preview for payloads stored without preview_100."""
+    return text[:100] + "..." if len(text) > 100 else text
+
+
+async def _embed_and_store(
+    batches: AsyncIterator[list[Chunk]],
+    embedding_service,
+    vector_store,
+) -> int:
+    """
+    Embed and store chunks as a document is extracted.
+
+    Extraction, embedding and upserts run as one pipeline over the whole
+    stream: the next chunks are extracted while earlier ones are embedded,
+    and each embedded batch is written while the next one is embedded.
+    Bounded queues between the stages cap how many chunks are in flight.
+    The embed and upsert calls are synchronous, so they run in worker
+    threads off the event loop.
+
+    Returns:
+        Number of chunks stored
+
+    Raises:
+        ValueError: If the PDF is not acceptable or fails to process;
+            embed/store failures surface as ExceptionGroup
+    """
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    store_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+    extract_error: ValueError | None = None
+    stored = 0
+
+    async def extractor() -> None:
+        nonlocal extract_error
+        try:
+            async for chunks in batches:
+                await chunk_queue.put(chunks)
+        except ValueError as e:
+            extract_error = e
+            raise
+        await chunk_queue.put(None)
+
+    async def embedder() -> None:
+        while (chunks := await chunk_queue.get()) is not None:
+            for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+                batch = chunks[start:start + EMBED_BATCH_SIZE]
+                embeddings = await asyncio.to_thread(
+                    embedding_service.embed_texts, [chunk.text for chunk in batch]
+                )
+                await store_queue.put((batch, embeddings))
+        await store_queue.put(None)
+
+    async def writer() -> None:
+        nonlocal stored
+        while (item := await store_queue.get()) is not None:
+            batch, embeddings = item
+            stored += await asyncio.to_thread(vector_store.add_chunks, batch, embeddings)
+
+    # TaskGroup cancels the other stages if one fails
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(extractor())
+            tg.create_task(embedder())
+            tg.create_task(writer())
+    except ExceptionGroup:
+        # A rejected PDF is reported as such, not as a pipeline failure
+        if extract_error is not None:
+            raise extract_error from None
+        raise
+
+    return stored
+
+
+def _discard_partial_upload(vector_store, document, user_id: str) -> None:
+    """Don't leave a partially indexed document behind."""
+    # page_count is set once extraction starts; before that nothing was stored
+    if document.page_count:
+        vector_store.delete_by_document(document.id, user_id)
 
 
 @router.get(
@@ -30,21 +143,35 @@ router = APIRouter(prefix="/documents", tags=["documents"])
     responses={401: {"model": ErrorResponse}, 403: {"model": ErrorResponse}},
 )
 async def list_documents(
-    _api_key: str = Depends(verify_api_key),
+    request: Request,
+    response: Response,
     user_id: str = Depends(get_user_id_from_token),
 ) -> DocumentListResponse:
     """
     List all uploaded documents for the current user.
 
     Returns document metadata including page count, chunk count, and upload date.
+    Supports conditional requests: a matching If-None-Match returns 304.
     """
     settings = get_settings()
     vector_store = get_vector_store()
 
     stored_docs = vector_store.get_all_documents(user_id)
 
+    # Let clients revalidate instead of re-downloading an unchanged listing
+    etag = _document_list_etag(stored_docs)
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
+
+    # StoredDocument is already validated; skip re-validation
     documents = [
-        DocumentSummary(
+        DocumentSummary.model_construct(
             id=doc.id,
             title=doc.title,
             page_count=doc.page_count,
@@ -76,7 +203,6 @@ async def list_documents(
 async def upload_document(
     file: UploadFile = File(..., description="PDF file to upload"),
     title: str | None = Form(None, description="Optional custom title"),
-    _api_key: str = Depends(verify_api_key),
     user_id: str = Depends(get_user_id_from_token),
 ) -> DocumentUploadResponse:
     """
@@ -98,39 +224,43 @@ async def upload_document(
             detail=f"Document limit reached ({settings.max_documents}). Delete a document first.",
         )
 
-    # Read file content
-    content = await file.read()
+    # Read file content in chunks, rejecting oversized uploads early
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    buf = bytearray()
+    while chunk := await file.read(1 << 16):
+        buf.extend(chunk)
+        if len(buf) > max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"File too large. Maximum: {settings.max_file_size_mb}MB",
+            )
+    content = bytes(buf)
     filename = file.filename or "document.pdf"
 
-    # Validate file
-    is_valid, error_msg = pdf_processor.validate_file(content, filename)
-    if not is_valid:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=error_msg,
-        )
-
-    # Process PDF
+    # Validate, process and index the PDF as one streaming pipeline, so
+    # only a few batches of chunks are held in memory at a time
     start_time = time.time()
+    processed_doc = pdf_processor.new_document(filename, title, len(content))
     try:
-        processed_doc = pdf_processor.process_pdf(content, filename, user_id, title)
+        # aclosing releases the processing slot even if indexing fails midway
+        async with aclosing(
+            pdf_processor.aiter_process_pdf(content, filename, processed_doc, user_id)
+        ) as batches:
+            chunk_count = await _embed_and_store(batches, embedding_service, vector_store)
+        if not chunk_count:
+            # Nothing searchable (e.g. a scanned PDF); don't list it
+            raise ValueError("No extractable text found in PDF")
+        await asyncio.to_thread(vector_store.add_document, processed_doc, user_id, chunk_count)
     except ValueError as e:
+        # Invalid or unprocessable PDF
+        _discard_partial_upload(vector_store, processed_doc, user_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to process PDF: {str(e)}",
-        )
-
-    # Generate embeddings for chunks
-    chunk_texts = [chunk.text for chunk in processed_doc.chunks]
-    embeddings = embedding_service.embed_texts(chunk_texts)
-
-    # Store in vector database
-    vector_store.add_chunks(processed_doc.chunks, embeddings)
+    except BaseException:
+        _discard_partial_upload(vector_store, processed_doc, user_id)
+        raise
 
     processing_time_ms = int((time.time() - start_time) * 1000)
 
@@ -138,10 +268,10 @@ async def upload_document(
         id=processed_doc.id,
         title=processed_doc.title,
         page_count=processed_doc.page_count,
-        chunk_count=len(processed_doc.chunks),
+        chunk_count=chunk_count,
         sections_detected=processed_doc.sections,
         processing_time_ms=processing_time_ms,
-        message=f"Document processed successfully. Created {len(processed_doc.chunks)} searchable chunks.",
+        message=f"Document processed successfully. Created {chunk_count} searchable chunks.",
     )
 
 
@@ -156,7 +286,6 @@ async def upload_document(
 )
 async def get_document(
     document_id: str,
-    _api_key: str = Depends(verify_api_key),
     user_id: str = Depends(get_user_id_from_token),
 ) -> DocumentDetailResponse:
     """
@@ -175,39 +304,38 @@ async def get_document(
             detail=f"Document not found: {document_id}",
         )
 
-    # Build response
-    chunks = [
-        ChunkSummary(
+    # Build chunk summaries, page count and unique sections in one pass
+    chunks = []
+    page_count = 0
+    sections_set = set()
+    for c in chunks_data:
+        page_number = c.get("page_number", 0)
+        if page_number > page_count:
+            page_count = page_number
+        section_title = c.get("section_title")
+        if section_title:
+            sections_set.add(section_title)
+        # Trusted payload written by our own ingest; skip re-validation
+        chunks.append(ChunkSummary.model_construct(
             chunk_id=c.get("chunk_id", ""),
-            page_number=c.get("page_number", 0),
-            section_title=c.get("section_title"),
+            page_number=page_number,
+            section_title=section_title,
             token_count=c.get("token_count", 0),
-            preview=c.get("text", "")[:100] + "..." if len(c.get("text", "")) > 100 else c.get("text", ""),
-        )
-        for c in chunks_data
-    ]
+            preview=c.get("preview_100") or _preview(c.get("text", "")),
+        ))
+    sections = list(sections_set)
 
     # Extract document info from first chunk
     first_chunk = chunks_data[0]
     title = first_chunk.get("document_title", "Unknown")
 
-    # Calculate page count from max page number
-    page_count = max(c.get("page_number", 0) for c in chunks_data)
-
-    # Extract unique sections
-    sections = list(set(
-        c.get("section_title")
-        for c in chunks_data
-        if c.get("section_title")
-    ))
-
     return DocumentDetailResponse(
         id=document_id,
         title=title,
         page_count=page_count,
         chunks=chunks,
         sections=sections,
-        uploaded_at=datetime.utcnow(),  # TODO: Store actual upload time
+        uploaded_at=utcnow_cached(),  # TODO: Store actual upload time
     )
 
 
@@ -222,7 +350,6 @@ async def get_document(
 )
 async def delete_document(
     document_id: str,
-    _api_key: str = Depends(verify_api_key),
     user_id: str = Depends(get_user_id_from_token),
 ) -> DeleteResponse:
     """
@@ -232,15 +359,13 @@ async def delete_document(
     """
     vector_store = get_vector_store()
 
-    # Check if document exists for this user
-    chunks = vector_store.get_document_chunks(document_id, user_id)
-    if not chunks:
+    # The metadata point is the record of the document for this user
+    if not vector_store.document_exists(document_id, user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Document not found: {document_id}",
         )
 
-    # Delete the document
     chunks_removed = vector_store.delete_by_document(document_id, user_id)
 
     return DeleteResponse(
@@ -1,6 +1,8 @@
 """Health check endpoints."""
 
-from datetime import datetime
+import asyncio
+import inspect
+from collections.abc import Callable
 
 from fastapi import APIRouter
 
@@ -12,6 +14,17 @@ from ..services.llm_service import get_llm_service
 router = APIRouter(prefix="/health", tags=["health"])
 
 
+async def _probe(get_service: Callable) -> bool:
+    """Run a service's is_healthy() check without blocking the event loop."""
+    try:
+        service = await asyncio.to_thread(get_service)
+        if inspect.iscoroutinefunction(service.is_healthy):
+            return await service.is_healthy()
+        return await asyncio.to_thread(service.is_healthy)
+    except Exception:
+        return False
+
+
 @router.get("", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
     """
@@ -20,7 +33,7 @@ async def health_check() -> HealthResponse:
     Returns service status and timestamp.
     Used by load balancers and monitoring systems.
     """
-    return HealthResponse(status="healthy", timestamp=datetime.utcnow())
+    return HealthResponse(status="healthy")
 
 
 @router.get("/ready", response_model=ReadinessResponse)
@@ -31,24 +44,12 @@ async def readiness_check() -> ReadinessResponse:
     Checks all system components and returns their status.
     Use this to verify the service is ready to handle requests.
     """
-    # Check each component
-    try:
-        vector_store = get_vector_store()
-        vector_store_ok = vector_store.is_healthy()
-    except Exception:
-        vector_store_ok = False
-
-    try:
-        embedding_service = get_embedding_service()
-        embedding_ok = embedding_service.is_healthy()
-    except Exception:
-        embedding_ok = False
-
-    try:
-        llm_service = get_llm_service()
-        llm_ok = llm_service.is_healthy()
-    except Exception:
-        llm_ok = False
+    # Probe all components concurrently
+    vector_store_ok, embedding_ok, llm_ok = await asyncio.gather(
+        _probe(get_vector_store),
+        _probe(get_embedding_service),
+        _probe(get_llm_service),
+    )
 
     components = ComponentStatus(
         vector_store=vector_store_ok,
@@ -2,7 +2,14 @@
 
 import re
 import time
+from collections.abc import AsyncIterator
+from contextlib import aclosing
+from typing import Any
+
+import numpy as np
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 
 from ..auth import verify_api_key
 from .auth import get_user_id_from_token
@@ -21,7 +28,26 @@ from ..services.vector_store import get_vector_store
 from ..services.llm_service import get_llm_service
 from ..utils.cost_tracker import get_cost_tracker
 
-router = APIRouter(prefix="/query", tags=["query"])
+router = APIRouter(
+    prefix="/query",
+    tags=["query"],
+    dependencies=[Depends(verify_api_key)],
+)
+
+# Phrases the LLM uses when the sources don't answer the question
+_LOW_CONFIDENCE_RE = re.compile(
+    r"cannot find sufficient|insufficient information", re.IGNORECASE
+)
+
+# Payload fields used for prompts and citations; snippets are sliced from text
+_SEARCH_PAYLOAD_FIELDS = [
+    "document_id",
+    "document_title",
+    "page_number",
+    "section_title",
+    "text",
+    "token_count",
+]
 
 
 def normalize_query(question: str) -> str:
@@ -37,45 +63,36 @@ def normalize_query(question: str) -> str:
     return normalized
 
 
-@router.post(
-    "",
-    response_model=QueryResponse,
-    responses={
-        400: {"model": ErrorResponse},
-        401: {"model": ErrorResponse},
-        403: {"model": ErrorResponse},
-        422: {"model": InsufficientEvidenceResponse},
-        429: {"model": ErrorResponse},
-    },
-)
-async def query_documents(
-    request: QueryRequest,
-    _api_key: str = Depends(verify_api_key),
-    user_id: str = Depends(get_user_id_from_token),
-) -> QueryResponse:
-    """
-    Ask a question about uploaded documents.
+async def _embed_question(question_normalized: str) -> np.ndarray:
+    """Embed a normalized question via the cached, batched embedding path."""
+    return await get_embedding_service().embed_text_batched(question_normalized)
 
-    Returns an answer grounded in the source documents with citations.
-    If insufficient evidence is found, returns a 422 status with partial context.
-    """
-    settings = get_settings()
-    cost_tracker = get_cost_tracker()
 
-    # Check usage limits
-    can_proceed, limit_message = cost_tracker.can_process_query()
+async def _check_usage_limits() -> None:
+    """Raise 429 if the daily query or cost limit has been reached."""
+    can_proceed, limit_message = await get_cost_tracker().acan_process_query()
     if not can_proceed:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail=limit_message,
         )
 
-    embedding_service = get_embedding_service()
-    vector_store = get_vector_store()
-    llm_service = get_llm_service()
 
-    # Start total timing
-    total_start = time.time()
+async def _retrieve(
+    request: QueryRequest,
+    user_id: str,
+) -> tuple[list[dict[str, Any]], list[Citation], int, int]:
+    """
+    Embed the question and retrieve relevant chunks for it.
+
+    Returns:
+        Tuple of (chunks, citations, embed_time_ms, search_time_ms)
+
+    Raises:
+        HTTPException: If the user has no documents or nothing relevant is found
+    """
+    settings = get_settings()
+    vector_store = get_vector_store()
 
     # Check if any documents are uploaded for this user
     doc_count = vector_store.get_document_count(user_id)
@@ -90,7 +107,8 @@ async def query_documents(
 
     # Generate query embedding (with timing)
     embed_start = time.time()
-    query_embedding = embedding_service.embed_text(normalized_question)
+    # The embedding model is uncased, so case/whitespace-folding is lossless
+    query_embedding = await _embed_question(normalized_question.strip().lower())
     embed_time_ms = int((time.time() - embed_start) * 1000)
 
     # Retrieve relevant chunks (with timing)
@@ -101,21 +119,22 @@ async def query_documents(
         limit=request.max_citations or settings.top_k_chunks,
         document_ids=request.document_ids,
         min_score=settings.min_relevance_score,
+        include_fields=_SEARCH_PAYLOAD_FIELDS,
     )
     search_time_ms = int((time.time() - search_start) * 1000)
 
-    # Build citations from retrieved chunks
-    citations = [
-        Citation(
+    citations = []
+    for chunk in chunks:
+        # Trusted payload written by our own ingest; skip re-validation
+        citations.append(Citation.model_construct(
             document_id=chunk.get("document_id", ""),
             document_title=chunk.get("document_title", "Unknown"),
             page_number=chunk.get("page_number", 0),
             section_title=chunk.get("section_title"),
-            text_snippet=chunk.get("text", "")[:500],  # Truncate for response
+            # text is fetched for the prompt anyway; slicing it is cheap
+            text_snippet=chunk.get("text", "")[:500],
             relevance_score=chunk.get("score", 0.0),
-        )
-        for chunk in chunks
-    ]
+        ))
 
     # Check if we have any relevant chunks
     if not chunks:
@@ -133,28 +152,84 @@ async def query_documents(
             },
         )
 
+    return chunks, citations, embed_time_ms, search_time_ms
+
+
+def _retrieval_tokens(chunks: list[dict[str, Any]]) -> int:
+    """Sum the ingest-time token counts of the chunks sent as context."""
+    return sum(chunk.get("token_count", 0) for chunk in chunks)
+
+
+def _confidence_warning(confidence: str) -> str | None:
+    """Build warning if confidence is low."""
+    if confidence == "low":
+        return "The answer has low confidence. Please verify with the source documents."
+    if confidence == "medium":
+        return "Some parts of this answer may require additional verification."
+    return None
+
+
+def _sse_event(event: str, data: Any) -> bytes:
+    """Format a server-sent event with a JSON payload."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.post(
+    "",
+    response_model=QueryResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        401: {"model": ErrorResponse},
+        403: {"model": ErrorResponse},
+        422: {"model": InsufficientEvidenceResponse},
+        429: {"model": ErrorResponse},
+    },
+)
+async def query_documents(
+    request: QueryRequest,
+    user_id: str = Depends(get_user_id_from_token),
+) -> QueryResponse:
+    """
+    Ask a question about uploaded documents.
+
+    Returns an answer grounded in the source documents with citations.
+    If insufficient evidence is found, returns a 422 status with partial context.
+    """
+    cost_tracker = get_cost_tracker()
+
+    # Check usage limits
+    await _check_usage_limits()
+
+    llm_service = get_llm_service()
+
+    # Start total timing
+    total_start = time.time()
+
+    chunks, citations, embed_time_ms, search_time_ms = await _retrieve(request, user_id)
+
     # Generate answer with GPT-4o (with timing)
     llm_start = time.time()
-    result = llm_service.generate_answer(
+    result = await llm_service.generate_answer(
         question=request.question,
         context_chunks=chunks,
     )
+
+    # Only cite the sources that fit the context budget and reached the model
+    sources_used = result["sources_used"]
+    citations = citations[:sources_used]
+    retrieval_tokens = _retrieval_tokens(chunks[:sources_used])
     llm_time_ms = int((time.time() - llm_start) * 1000)
     total_time_ms = int((time.time() - total_start) * 1000)
 
     # Track usage
-    cost_tracker.track_query(
+    await cost_tracker.atrack_query(
         input_tokens=result["input_tokens"],
         output_tokens=result["output_tokens"],
         cost_usd=result["cost_usd"],
     )
 
     # Check for low confidence / insufficient evidence
-    answer_lower = result["answer"].lower()
-    if (
-        result["confidence"] == "low" and
-        ("cannot find sufficient" in answer_lower or "insufficient information" in answer_lower)
-    ):
+    if result["confidence"] == "low" and _LOW_CONFIDENCE_RE.search(result["answer"]):
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail={
@@ -169,31 +244,116 @@ async def query_documents(
             },
         )
 
-    # Calculate retrieval tokens
-    retrieval_tokens = sum(chunk.get("token_count", 0) for chunk in chunks)
-
-    # Build warning if confidence is low
-    warning = None
-    if result["confidence"] == "low":
-        warning = "The answer has low confidence. Please verify with the source documents."
-    elif result["confidence"] == "medium":
-        warning = "Some parts of this answer may require additional verification."
-
-    return QueryResponse(
+    # Assembled from trusted service output; FastAPI still serializes it
+    # against the response_model, so skip a second validation pass here
+    return QueryResponse.model_construct(
         answer=result["answer"],
         citations=citations,
         confidence=result["confidence"],
-        usage=QueryUsage(
+        usage=QueryUsage.model_construct(
             retrieval_tokens=retrieval_tokens,
             llm_input_tokens=result["input_tokens"],
             llm_output_tokens=result["output_tokens"],
             estimated_cost_usd=result["cost_usd"],
-            timing=QueryTiming(
+            timing=QueryTiming.model_construct(
                 embedding_ms=embed_time_ms,
                 search_ms=search_time_ms,
                 llm_ms=llm_time_ms,
                 total_ms=total_time_ms,
             ),
         ),
-        warning=warning,
+        warning=_confidence_warning(result["confidence"]),
+    )
+
+
+@router.post(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        400: {"model": ErrorResponse},
+        401: {"model": ErrorResponse},
+        403: {"model": ErrorResponse},
+        422: {"model": InsufficientEvidenceResponse},
+        429: {"model": ErrorResponse},
+    },
+)
+async def stream_query(
+    request: QueryRequest,
+    user_id: str = Depends(get_user_id_from_token),
+) -> StreamingResponse:
+    """
+    Ask a question and stream the answer as server-sent events.
+
+    Emits a `citations` event first, then one `delta` event per piece of
+    generated text, and finally a `done` event with the same fields as the
+    non-streaming QueryResponse (minus the answer, already streamed).
+    Errors detected before generation starts return the usual 4xx statuses.
+    """
+    cost_tracker = get_cost_tracker()
+
+    await _check_usage_limits()
+
+    llm_service = get_llm_service()
+    total_start = time.time()
+
+    chunks, citations, embed_time_ms, search_time_ms = await _retrieve(request, user_id)
+
+    async def events() -> AsyncIterator[bytes]:
+        retrieval_tokens = 0
+
+        async def track_usage(result: dict[str, Any]) -> None:
+            await cost_tracker.atrack_query(
+                input_tokens=result["input_tokens"],
+                output_tokens=result["output_tokens"],
+                cost_usd=result["cost_usd"],
+            )
+
+        llm_start = time.time()
+        # aclosing runs the stream's cleanup (closing the OpenAI stream and
+        # tracking usage so far) as soon as the client disconnects
+        async with aclosing(llm_service.stream_answer(
+            question=request.question,
+            context_chunks=chunks,
+            on_usage=track_usage,
+        )) as stream:
+            async for item in stream:
+                if item["type"] == "sources":
+                    # Only cite the sources that fit the context budget
+                    used = item["count"]
+                    retrieval_tokens = _retrieval_tokens(chunks[:used])
+                    yield _sse_event(
+                        "citations", [c.model_dump(mode="json") for c in citations[:used]]
+                    )
+                    continue
+
+                if item["type"] == "delta":
+                    yield _sse_event("delta", item["content"])
+                    continue
+
+                llm_time_ms = int((time.time() - llm_start) * 1000)
+                total_time_ms = int((time.time() - total_start) * 1000)
+
+                usage = QueryUsage.model_construct(
+                    retrieval_tokens=retrieval_tokens,
+                    llm_input_tokens=item["input_tokens"],
+                    llm_output_tokens=item["output_tokens"],
+                    estimated_cost_usd=item["cost_usd"],
+                    timing=QueryTiming.model_construct(
+                        embedding_ms=embed_time_ms,
+                        search_ms=search_time_ms,
+                        llm_ms=llm_time_ms,
+                        total_ms=total_time_ms,
+                    ),
+                )
+                yield _sse_event("done", {
+                    "confidence": item["confidence"],
+                    "usage": usage.model_dump(mode="json"),
+                    "warning": _confidence_warning(item["confidence"]),
+                })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
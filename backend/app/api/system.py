@@ -60,7 +60,7 @@ async def get_usage_stats() -> UsageResponse:
     cost_tracker = get_cost_tracker()
     vector_store = get_vector_store()
 
-    stats = cost_tracker.get_usage_stats()
+    stats = await cost_tracker.aget_usage_stats()
 
     return UsageResponse(
         period=stats["period"],
@@ -1,24 +1,38 @@
 """API Key authentication middleware."""
 
-from fastapi import Depends, HTTPException, Security, status
+import secrets
+
+from fastapi import HTTPException, Security, status
 from fastapi.security import APIKeyHeader
 
-from .config import get_settings, Settings
+from .config import get_settings
 
 # API Key header configuration
 API_KEY_HEADER = APIKeyHeader(name="X-API-Key", auto_error=False)
 
+# Settings are immutable after startup; bind once instead of per request
+_settings = get_settings()
+
+# Prebuilt errors, raised via .with_traceback(None) so tracebacks don't pile up
+MISSING_API_KEY_EXC = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Missing API key. Include X-API-Key header.",
+    headers={"WWW-Authenticate": "ApiKey"},
+)
+INVALID_API_KEY_EXC = HTTPException(
+    status_code=status.HTTP_403_FORBIDDEN,
+    detail="Invalid API key.",
+)
+
 
 async def verify_api_key(
     api_key: str | None = Security(API_KEY_HEADER),
-    settings: Settings = Depends(get_settings),
 ) -> str:
     """
     Verify the API key from the X-API-Key header.
 
     Args:
         api_key: The API key from the request header
-        settings: Application settings
 
     Returns:
         The validated API key
@@ -27,16 +41,9 @@ async def verify_api_key(
         HTTPException: If API key is missing or invalid
     """
     if api_key is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Missing API key. Include X-API-Key header.",
-            headers={"WWW-Authenticate": "ApiKey"},
-        )
-
-    if api_key != settings.api_key:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Invalid API key.",
-        )
+        raise MISSING_API_KEY_EXC.with_traceback(None)
+
+    if not secrets.compare_digest(api_key.encode(), _settings.api_key.encode()):
+        raise INVALID_API_KEY_EXC.with_traceback(None)
 
     return api_key
@@ -22,6 +22,7 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4o"  # Best quality model
     openai_max_tokens: int = 2000  # Allow thorough answers
     openai_temperature: float = 0.1
+    max_context_tokens: int = 8000  # Token budget for retrieved sources in the prompt
 
     # Qdrant Cloud Configuration
     qdrant_url: str  # Required - set via environment variable
@@ -37,6 +38,17 @@ class Settings(BaseSettings):
     chunk_size_tokens: int = 600
     chunk_overlap_tokens: int = 100
 
+    # Embedding Configuration
+    # "torch" (sentence-transformers) or "onnx" (int8-quantized ONNX Runtime)
+    embedding_backend: str = "torch"
+    onnx_model_dir: str = ".onnx_models"
+
+    # Shared cache (optional) - enables cross-worker caching when set
+    redis_url: str | None = None
+    redis_timeout_seconds: float = 0.5  # Connect/read timeout per call
+    embedding_cache_size: int = 4096  # In-process LRU entries
+    embedding_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+
     # Retrieval Configuration
     top_k_chunks: int = 10  # More context for better answers
     min_relevance_score: float = 0.15  # Filter out low relevance chunks
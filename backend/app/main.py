@@ -1,12 +1,41 @@
 """FastAPI application entry point."""
 
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Any
 
+import orjson
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from .api import health, documents, query, system, auth
 from .config import get_settings
+from .services.embedding_service import get_embedding_service
+from .services.llm_service import get_llm_service
+from .services.pdf_processor import get_pdf_processor
+from .services.vector_store import get_vector_store
+from .utils.cost_tracker import get_cost_tracker
+
+
+class AppJSONResponse(ORJSONResponse):
+    """orjson response that also emits NumPy arrays and naive datetimes as UTC."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC,
+        )
+
+
+# Fixed CORS configuration, built once at import
+CORS_ALLOW_METHODS = ("GET", "POST", "DELETE", "OPTIONS")
+CORS_ALLOW_HEADERS = ("*",)
+
+
+def _normalize_origins(origins: list[str]) -> list[str]:
+    """Lower-case origins, strip trailing slashes and drop duplicates."""
+    return list(dict.fromkeys(origin.strip().rstrip("/").lower() for origin in origins))
 
 
 @asynccontextmanager
@@ -17,10 +46,34 @@ async def lifespan(app: FastAPI):
     print(f"Starting {settings.app_name} v{settings.app_version}")
     print(f"Environment: {settings.environment}")
 
+    # Warm service singletons so the first request doesn't pay for setup
+    get_pdf_processor()
+    get_llm_service()
+    get_cost_tracker()
+    try:
+        get_vector_store()
+    except Exception as e:
+        # Readiness check reports the failure; retried on first use
+        print(f"Vector store unavailable at startup: {e}")
+
+    # Load the embedding model before traffic arrives
+    try:
+        await asyncio.to_thread(get_embedding_service().warmup)
+    except Exception as e:
+        print(f"Embedding model warmup failed: {e}")
+
+    # Periodically evict expired sessions instead of sweeping per request
+    session_cleanup = asyncio.create_task(auth.cleanup_sessions_periodically())
+
     yield
 
     # Shutdown: Cleanup
     print("Shutting down...")
+    session_cleanup.cancel()
+    with suppress(asyncio.CancelledError):
+        await session_cleanup
+    await get_embedding_service().aclose()
+    await get_llm_service().aclose()
 
 
 def create_app() -> FastAPI:
@@ -35,15 +88,16 @@ def create_app() -> FastAPI:
         docs_url=f"{settings.api_prefix}/docs",
         redoc_url=f"{settings.api_prefix}/redoc",
         lifespan=lifespan,
+        default_response_class=AppJSONResponse,
     )
 
     # CORS middleware
     app.add_middleware(
         CORSMiddleware,
-        allow_origins=settings.cors_origins,
+        allow_origins=_normalize_origins(settings.cors_origins),
         allow_credentials=True,
-        allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
-        allow_headers=["*"],
+        allow_methods=CORS_ALLOW_METHODS,
+        allow_headers=CORS_ALLOW_HEADERS,
     )
 
     # Include routers
@@ -1,9 +1,14 @@
 """Internal document models."""
 
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import BaseModel, Field
 
 
+def _utcnow() -> datetime:
+    """Timezone-aware replacement for the deprecated datetime.utcnow."""
+    return datetime.now(timezone.utc)
+
+
 class Chunk(BaseModel):
     """A chunk of text from a document."""
 
@@ -26,7 +31,7 @@ class ProcessedDocument(BaseModel):
     chunks: list[Chunk] = Field(default_factory=list)
     sections: list[str] = Field(default_factory=list)
     file_size_bytes: int | None = Field(None, description="Original file size")
-    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    uploaded_at: datetime = Field(default_factory=_utcnow)
 
 
 class StoredDocument(BaseModel):
@@ -38,4 +43,4 @@ class StoredDocument(BaseModel):
     chunk_count: int = Field(..., description="Number of chunks")
     sections: list[str] = Field(default_factory=list)
     file_size_bytes: int | None = Field(None)
-    uploaded_at: datetime = Field(default_factory=datetime.utcnow)
+    uploaded_at: datetime = Field(default_factory=_utcnow)
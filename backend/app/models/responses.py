@@ -3,13 +3,16 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
 
+from ..utils.timestamps import utcnow_cached
+
 
 # Health Responses
 class HealthResponse(BaseModel):
     """Health check response."""
 
     status: str = Field(..., description="Service health status")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    # Cached per second; probes don't need sub-second precision
+    timestamp: datetime = Field(default_factory=utcnow_cached)
 
 
 class ComponentStatus(BaseModel):
@@ -1,7 +1,115 @@
 """Embedding service using sentence-transformers."""
 
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import redis
 from sentence_transformers import SentenceTransformer
 
+from ..config import get_settings, Settings
+from ..utils.redis_client import get_redis
+from ..utils.singleton import singleton
+
+
+class OnnxEncoder:
+    """
+    Int8-quantized ONNX Runtime encoder with a SentenceTransformer-like API.
+
+    Reproduces the all-MiniLM-L6-v2 pipeline (transformer, mean pooling,
+    L2 normalization) on a dynamically quantized ONNX export. Requires the
+    optional `optimum[onnxruntime]` dependency.
+    """
+
+    MAX_SEQ_LENGTH = 256
+
+    def __init__(self, model_name: str, cache_dir: str):
+        """
+        Load the quantized model, exporting and quantizing it on first use.
+
+        Args:
+            model_name: sentence-transformers model name
+            cache_dir: Directory holding the exported/quantized model
+        """
+        try:
+            import onnxruntime
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError(
+                "ONNX embedding backend requires `pip install optimum[onnxruntime]`"
+            ) from e
+
+        model_dir = Path(cache_dir) / model_name.replace("/", "__")
+        model_path = model_dir / "model_quantized.onnx"
+        if not model_path.exists():
+            self._export(model_name, model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+
+    @staticmethod
+    def _export(model_name: str, model_dir: Path) -> None:
+        """Export the model to ONNX and apply dynamic int8 quantization."""
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        from transformers import AutoTokenizer
+
+        hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        model = ORTModelForFeatureExtraction.from_pretrained(hub_name, export=True)
+        quantizer = ORTQuantizer.from_pretrained(model)
+        quantizer.quantize(
+            save_dir=model_dir,
+            quantization_config=AutoQuantizationConfig.avx512_vnni(
+                is_static=False, per_channel=False
+            ),
+        )
+        AutoTokenizer.from_pretrained(hub_name).save_pretrained(model_dir)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """Get the embedding dimension."""
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: str | list[str],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+    ) -> np.ndarray:
+        """Encode one text or a list of texts into normalized embeddings."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else sentences
+
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encoded = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.MAX_SEQ_LENGTH,
+                return_tensors="np",
+            )
+            inputs = {k: v for k, v in encoded.items() if k in self._input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            # Mean pooling over non-padding tokens, then L2 normalize
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            summed = (token_embeddings * mask).sum(axis=1)
+            pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            outputs.append(pooled / np.clip(norms, 1e-12, None))
+
+        embeddings = np.concatenate(outputs) if outputs else np.empty((0, self._dimension))
+        embeddings = embeddings.astype(np.float32)
+        return embeddings[0] if single else embeddings
+
 
 class EmbeddingService:
     """Service for generating text embeddings using sentence-transformers."""
@@ -9,23 +117,55 @@ class EmbeddingService:
     # Model that fits within Render free tier 512MB RAM
     MODEL_NAME = "all-MiniLM-L6-v2"
 
-    def __init__(self, model_name: str | None = None):
+    # Seconds a successful health check is reused
+    HEALTH_CACHE_TTL = 30
+
+    # Micro-batching of concurrent embed_text_batched calls
+    MAX_BATCH = 32
+    MAX_WAIT_MS = 5
+
+    def __init__(self, model_name: str | None = None, settings: Settings | None = None):
         """
         Initialize the embedding service.
 
         Args:
             model_name: Optional model name override
+            settings: Optional settings override
         """
+        self.settings = settings or get_settings()
         self.model_name = model_name or self.MODEL_NAME
-        self._model: SentenceTransformer | None = None
+        self._model: SentenceTransformer | OnnxEncoder | None = None
+
+        # LRU of blake2b(text) -> embedding, optionally backed by Redis
+        self._cache: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._redis = get_redis(self.settings)
+        self._queue: asyncio.Queue | None = None
+        self._batch_task: asyncio.Task | None = None
+        self._healthy_at = float("-inf")
 
     @property
-    def model(self) -> SentenceTransformer:
+    def model(self) -> SentenceTransformer | OnnxEncoder:
         """Lazy load the model on first use."""
         if self._model is None:
-            self._model = SentenceTransformer(self.model_name)
+            if self.settings.embedding_backend == "onnx":
+                self._model = OnnxEncoder(self.model_name, self.settings.onnx_model_dir)
+            else:
+                self._model = SentenceTransformer(self.model_name)
         return self._model
 
+    def warmup(self) -> None:
+        """
+        Load the model and run one encode so the first request is fast.
+
+        Caps torch intra-op threads at OMP_NUM_THREADS (default 2) to match
+        the container CPU quota and avoid oversubscription.
+        """
+        if self.settings.embedding_backend != "onnx":
+            import torch
+
+            torch.set_num_threads(int(os.getenv("OMP_NUM_THREADS", "2")))
+        self.model.encode("warmup", convert_to_numpy=True)
+
     @property
     def dimension(self) -> int:
         """Get the embedding dimension."""
@@ -33,27 +173,115 @@ class EmbeddingService:
 
     def is_healthy(self) -> bool:
         """Check if the model is loaded and working."""
+        if time.monotonic() - self._healthy_at < self.HEALTH_CACHE_TTL:
+            return True
         try:
-            # Try to generate a simple embedding
-            _ = self.embed_text("test")
+            # Try to generate a simple embedding (bypassing the cache)
+            _ = self._encode("test")
+            self._healthy_at = time.monotonic()
             return True
         except Exception:
             return False
 
-    def embed_text(self, text: str) -> list[float]:
+    def _encode(self, texts: str | list[str]) -> np.ndarray:
+        """Run the model and return float32 embeddings."""
+        return np.asarray(self.model.encode(texts, convert_to_numpy=True), dtype=np.float32)
+
+    def embed_text_bytes(self, text: str) -> bytes:
+        """
+        Generate embedding for a single text as raw float32 bytes.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Little-endian float32 vector bytes, ready for wire serialization
+        """
+        return self.embed_text(text).tobytes()
+
+    def _cache_key(self, text: str) -> bytes:
+        """Hash a text into a compact cache key."""
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def _redis_key(self, key: bytes) -> str:
+        """Namespace a cache key by model and backend so switching either doesn't collide."""
+        return f"emb:{self.settings.embedding_backend}:{self.model_name}:{key.hex()}"
+
+    def _cache_get_local(self, key: bytes) -> np.ndarray | None:
+        """Look up an embedding in the in-process LRU."""
+        embedding = self._cache.get(key)
+        if embedding is not None:
+            self._cache.move_to_end(key)
+        return embedding
+
+    def _cache_put_local(self, key: bytes, embedding: np.ndarray) -> None:
+        """Insert an embedding into the in-process LRU, evicting the oldest."""
+        # Cached arrays are shared between callers, so make them read-only
+        embedding.flags.writeable = False
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.settings.embedding_cache_size:
+            self._cache.popitem(last=False)
+
+    def _cache_get_shared(self, key: bytes) -> np.ndarray | None:
+        """Look up an embedding in Redis, stored as raw float32 bytes."""
+        if self._redis is None:
+            return None
+        try:
+            raw = self._redis.get(self._redis_key(key))
+        except redis.RedisError:
+            return None
+        if raw is None:
+            return None
+        return np.frombuffer(raw, dtype=np.float32)
+
+    def _cache_put_shared(self, key: bytes, embedding: np.ndarray) -> None:
+        """Store an embedding in Redis as raw float32 bytes."""
+        if self._redis is None:
+            return
+        try:
+            self._redis.set(
+                self._redis_key(key),
+                embedding.tobytes(),
+                ex=self.settings.embedding_cache_ttl_seconds,
+            )
+        except redis.RedisError:
+            pass
+
+    def _cache_get(self, key: bytes) -> np.ndarray | None:
+        """Look up an embedding in the local LRU, then the shared cache."""
+        embedding = self._cache_get_local(key)
+        if embedding is None:
+            embedding = self._cache_get_shared(key)
+            if embedding is not None:
+                self._cache_put_local(key, embedding)
+        return embedding
+
+    def _cache_put(self, key: bytes, embedding: np.ndarray) -> None:
+        """Store an embedding in both the local LRU and the shared cache."""
+        self._cache_put_local(key, embedding)
+        self._cache_put_shared(key, embedding)
+
+    def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
 
+        Repeated texts are served from the embedding cache.
+
         Args:
             text: Input text
 
         Returns:
-            Embedding vector as list of floats
+            Embedding vector as a float32 array
         """
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        key = self._cache_key(text)
+        embedding = self._cache_get(key)
+        if embedding is None:
+            embedding = self._encode(text)
+            self._cache_put(key, embedding)
+        return embedding
 
-    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
         """
         Generate embeddings for multiple texts.
 
@@ -63,22 +291,87 @@ class EmbeddingService:
             texts: List of input texts
 
         Returns:
-            List of embedding vectors
+            Embedding vectors as a (len(texts), dimension) float32 array
         """
         if not texts:
-            return []
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        return self._encode(texts)
+
+    async def embed_text_batched(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text, coalescing concurrent callers.
+
+        Repeated texts are served from the embedding cache; misses arriving
+        within MAX_WAIT_MS of each other are encoded together in one model
+        call of up to MAX_BATCH texts.
+
+        Args:
+            text: Input text
+
+        Returns:
+            Embedding vector as a float32 array
+        """
+        key = self._cache_key(text)
+        embedding = self._cache_get_local(key)
+        if embedding is not None:
+            return embedding
+        if self._redis is not None:
+            embedding = await asyncio.to_thread(self._cache_get_shared, key)
+            if embedding is not None:
+                self._cache_put_local(key, embedding)
+                return embedding
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._batch_worker())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        embedding = await future
+
+        self._cache_put_local(key, embedding)
+        if self._redis is not None:
+            await asyncio.to_thread(self._cache_put_shared, key, embedding)
+        return embedding
+
+    async def _batch_worker(self) -> None:
+        """Drain queued texts in batches and resolve their futures."""
+        while True:
+            batch = [await self._queue.get()]
+
+            # Give concurrent callers a short window to join the batch
+            if self._queue.qsize() < self.MAX_BATCH - 1:
+                await asyncio.sleep(self.MAX_WAIT_MS / 1000)
+            while len(batch) < self.MAX_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
 
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(self.embed_texts, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
 
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
 
-# Singleton instance
-_embedding_service: EmbeddingService | None = None
+    async def aclose(self) -> None:
+        """Stop the background batching task."""
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except asyncio.CancelledError:
+                pass
+            self._batch_task = None
 
 
+@singleton
 def get_embedding_service() -> EmbeddingService:
     """Get or create embedding service instance."""
-    global _embedding_service
-    if _embedding_service is None:
-        _embedding_service = EmbeddingService()
-    return _embedding_service
+    return EmbeddingService()
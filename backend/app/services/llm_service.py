@@ -1,12 +1,24 @@
 """LLM service using OpenAI GPT-4o with strict grounding."""
 
+import asyncio
+import os
 import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
 from typing import Any
 
+import anyio
+import httpx
 import tiktoken
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 from ..config import get_settings, Settings
+from ..utils.singleton import singleton
+
+# Shared BPE tokenizer for all LLMService instances
+_TOKENIZER = tiktoken.get_encoding("cl100k_base")
+# Threads for batch tokenization (tiktoken releases the GIL)
+_TOKENIZER_THREADS = min(4, os.cpu_count() or 1)
 
 
 class LLMService:
@@ -32,91 +44,153 @@ IMPORTANT:
 - If you cannot find the answer, explain what information IS available
 - This is for legal research assistance only, not legal advice"""
 
+    # Confidence markers, matched case-insensitively without lowercasing the answer
+    _CONFIDENCE_RE = re.compile(r"confidence:\s*(high|medium|low)", re.IGNORECASE)
+    _LOW_RE = re.compile(r"cannot find sufficient|insufficient", re.IGNORECASE)
+    _HIGH_RE = re.compile(r"clearly|explicitly", re.IGNORECASE)
+
+    # Seconds a successful health check is reused
+    HEALTH_CACHE_TTL = 30
+
     def __init__(self, settings: Settings | None = None):
         """Initialize the LLM service."""
         self.settings = settings or get_settings()
-        self.client = OpenAI(api_key=self.settings.openai_api_key)
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        # Persistent HTTP/2 connection pool shared by all OpenAI requests
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+        self.client = AsyncOpenAI(
+            api_key=self.settings.openai_api_key,
+            http_client=self._http,
+        )
+        self.tokenizer = _TOKENIZER
+        # Fixed prompt; tokenize once instead of on every request
+        self._system_tokens = self.count_tokens(self.SYSTEM_PROMPT)
+        self._healthy_at = float("-inf")
+
+    async def aclose(self) -> None:
+        """Close the underlying HTTP connection pool."""
+        await self._http.aclose()
 
     def count_tokens(self, text: str) -> int:
         """Count tokens in a text string."""
-        return len(self.tokenizer.encode(text))
+        # Inputs are plain text; skip the special-token scan
+        return len(_TOKENIZER.encode_ordinary(text))
+
+    def count_tokens_batch(self, texts: list[str]) -> list[int]:
+        """Count tokens for many texts in one parallel tiktoken call."""
+        return [
+            len(ids)
+            for ids in _TOKENIZER.encode_ordinary_batch(texts, num_threads=_TOKENIZER_THREADS)
+        ]
 
-    def is_healthy(self) -> bool:
+    async def is_healthy(self) -> bool:
         """Check if OpenAI API is accessible."""
+        # Reuse a recent success rather than calling OpenAI on every probe
+        if time.monotonic() - self._healthy_at < self.HEALTH_CACHE_TTL:
+            return True
         try:
             # Make a minimal API call to check connectivity
-            self.client.models.retrieve(self.settings.openai_model)
+            await self.client.models.retrieve(self.settings.openai_model)
+            self._healthy_at = time.monotonic()
             return True
         except Exception:
             return False
 
-    def _build_context(self, chunks: list[dict[str, Any]]) -> str:
-        """Build detailed context string from retrieved chunks."""
-        context_parts = []
-
-        for i, chunk in enumerate(chunks):
-            source_num = i + 1
-            doc_title = chunk.get("document_title", "Unknown")
-            page_num = chunk.get("page_number", "?")
-            section = chunk.get("section_title", "")
-            text = chunk.get("text", "")
-            score = chunk.get("score", 0)
-
-            header = f"[Source {source_num}] Document: {doc_title} | Page: {page_num}"
-            if section:
-                header += f" | Section: {section}"
-            header += f" | Relevance: {score:.0%}"
+    def _build_context(
+        self,
+        chunks: list[dict[str, Any]],
+        token_budget: int | None = None,
+    ) -> tuple[str, int]:
+        """
+        Build detailed context string from retrieved chunks.
 
-            context_parts.append(f"{header}\n{text}")
+        Args:
+            chunks: Retrieved chunks, best match first
+            token_budget: Optional cap on context tokens; sources past the
+                budget are dropped (the first source is always kept)
 
-        return "\n\n---\n\n".join(context_parts)
+        Returns:
+            Tuple of (context, number of leading chunks included)
+        """
+        # One f-string per source instead of incremental header concatenation
+        context_parts = []
+        append = context_parts.append
+        used = 0
+
+        if token_budget is not None:
+            # Counted at ingest; only legacy payloads are re-encoded, together
+            token_counts = [chunk.get("token_count") for chunk in chunks]
+            legacy = [i for i, count in enumerate(token_counts) if count is None]
+            if legacy:
+                legacy_counts = self.count_tokens_batch(
+                    [chunks[i].get("text", "") for i in legacy]
+                )
+                for i, count in zip(legacy, legacy_counts):
+                    token_counts[i] = count
+
+        for source_num, chunk in enumerate(chunks, 1):
+            if token_budget is not None:
+                chunk_tokens = token_counts[source_num - 1]
+                if context_parts and used + chunk_tokens > token_budget:
+                    break
+                used += chunk_tokens
+
+            section = chunk.get("section_title")
+            section_part = f" | Section: {section}" if section else ""
+            append(
+                f"[Source {source_num}] Document: {chunk.get('document_title', 'Unknown')}"
+                f" | Page: {chunk.get('page_number', '?')}{section_part}"
+                f" | Relevance: {chunk.get('score', 0):.0%}\n{chunk.get('text', '')}"
+            )
+
+        return "\n\n---\n\n".join(context_parts), len(context_parts)
 
     def _parse_confidence(self, response_text: str) -> str:
         """Parse confidence level from response."""
-        text_lower = response_text.lower()
-
         # Look for explicit confidence statement
-        confidence_match = re.search(r'confidence:\s*(high|medium|low)', text_lower)
+        confidence_match = self._CONFIDENCE_RE.search(response_text)
         if confidence_match:
-            return confidence_match.group(1)
+            return confidence_match.group(1).lower()
 
         # Infer from content
-        if "cannot find sufficient" in text_lower or "insufficient" in text_lower:
+        if self._LOW_RE.search(response_text):
             return "low"
 
-        if "clearly" in text_lower or "explicitly" in text_lower:
+        if self._HIGH_RE.search(response_text):
             return "high"
 
         return "medium"
 
-    def generate_answer(
+    # Returned when retrieval produced nothing to ground an answer in
+    NO_CONTEXT_RESULT = {
+        "answer": "I cannot find sufficient information in the provided documents to answer this question. No relevant document sections were found.",
+        "confidence": "low",
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cost_usd": 0.0,
+        "sources_used": 0,
+    }
+
+    def _build_user_prompt(
         self,
         question: str,
         context_chunks: list[dict[str, Any]],
-    ) -> dict[str, Any]:
+    ) -> tuple[str, int]:
         """
-        Generate an answer using GPT-4o with strict grounding.
-
-        Args:
-            question: User's question
-            context_chunks: Retrieved document chunks
+        Build the user prompt with the question and document sources.
 
         Returns:
-            Dict with answer, confidence, and usage stats
+            Tuple of (prompt, number of leading chunks included as sources)
         """
-        if not context_chunks:
-            return {
-                "answer": "I cannot find sufficient information in the provided documents to answer this question. No relevant document sections were found.",
-                "confidence": "low",
-                "input_tokens": 0,
-                "output_tokens": 0,
-                "cost_usd": 0.0,
-            }
-
-        context = self._build_context(context_chunks)
+        context, sources_used = self._build_context(
+            context_chunks,
+            token_budget=self.settings.max_context_tokens,
+        )
 
-        user_prompt = f"""QUESTION: {question}
+        return f"""QUESTION: {question}
 
 DOCUMENT SOURCES:
 {context}
@@ -132,25 +206,27 @@ Requirements:
 End your response with exactly one of these:
 - "Confidence: high" - if the sources fully answer the question
 - "Confidence: medium" - if the sources partially answer the question
-- "Confidence: low" - if the sources don't contain relevant information"""
+- "Confidence: low" - if the sources don't contain relevant information""", sources_used
 
-        # Count input tokens
-        input_text = self.SYSTEM_PROMPT + user_prompt
-        input_tokens = self.count_tokens(input_text)
+    def _build_messages(self, user_prompt: str) -> list[dict[str, str]]:
+        """Build the chat messages for a completion request."""
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
 
-        # Call GPT-4o
-        response = self.client.chat.completions.create(
-            model=self.settings.openai_model,
-            messages=[
-                {"role": "system", "content": self.SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=self.settings.openai_temperature,
-            max_tokens=self.settings.openai_max_tokens,
-        )
+    def _count_input_tokens(self, user_prompt: str) -> asyncio.Task[int]:
+        """Start counting prompt input tokens in a worker thread."""
+        async def count() -> int:
+            return self._system_tokens + await asyncio.to_thread(
+                self.count_tokens, user_prompt
+            )
 
-        answer = response.choices[0].message.content or ""
-        output_tokens = self.count_tokens(answer)
+        return asyncio.create_task(count())
+
+    async def _build_result(self, answer: str, input_tokens: int) -> dict[str, Any]:
+        """Count output tokens, estimate cost and parse confidence for an answer."""
+        output_tokens = await asyncio.to_thread(self.count_tokens, answer)
 
         # Calculate cost
         cost = (
@@ -169,14 +245,121 @@ End your response with exactly one of these:
             "cost_usd": cost,
         }
 
+    async def generate_answer(
+        self,
+        question: str,
+        context_chunks: list[dict[str, Any]],
+    ) -> dict[str, Any]:
+        """
+        Generate an answer using GPT-4o with strict grounding.
 
-# Singleton instance
-_llm_service: LLMService | None = None
+        Args:
+            question: User's question
+            context_chunks: Retrieved document chunks
 
+        Returns:
+            Dict with answer, confidence, usage stats, and sources_used (how
+            many leading chunks fit the context budget and were sent)
+        """
+        if not context_chunks:
+            return dict(self.NO_CONTEXT_RESULT)
+
+        user_prompt, sources_used = self._build_user_prompt(question, context_chunks)
 
+        # Count input tokens in a worker thread while the request is in flight;
+        # the count is only needed for cost reporting afterwards
+        input_tokens_task = self._count_input_tokens(user_prompt)
+
+        # Call GPT-4o
+        response = await self.client.chat.completions.create(
+            model=self.settings.openai_model,
+            messages=self._build_messages(user_prompt),
+            temperature=self.settings.openai_temperature,
+            max_tokens=self.settings.openai_max_tokens,
+        )
+
+        answer = response.choices[0].message.content or ""
+        result = await self._build_result(answer, await input_tokens_task)
+        result["sources_used"] = sources_used
+        return result
+
+    async def stream_answer(
+        self,
+        question: str,
+        context_chunks: list[dict[str, Any]],
+        on_usage: Callable[[dict[str, Any]], Awaitable[None]] | None = None,
+    ) -> AsyncIterator[dict[str, Any]]:
+        """
+        Stream an answer from GPT-4o token by token.
+
+        Args:
+            question: User's question
+            context_chunks: Retrieved document chunks
+            on_usage: Awaited exactly once with the usage result, including
+                when the consumer stops early (the output tokens then cover
+                only the text generated so far)
+
+        Yields:
+            {"type": "sources", "count": int} first, with how many leading
+            chunks fit the context budget; then {"type": "delta",
+            "content": str} for each piece of generated text; then one
+            {"type": "result", ...} with the same fields as generate_answer
+            once the stream completes
+        """
+        if not context_chunks:
+            if on_usage is not None:
+                await on_usage(dict(self.NO_CONTEXT_RESULT))
+            yield {"type": "sources", "count": 0}
+            yield {"type": "result", **self.NO_CONTEXT_RESULT}
+            return
+
+        user_prompt, sources_used = self._build_user_prompt(question, context_chunks)
+        yield {"type": "sources", "count": sources_used}
+        input_tokens_task = self._count_input_tokens(user_prompt)
+
+        response = None
+        result = None
+        # Buffer the full text for confidence parsing and token counting
+        parts = []
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.settings.openai_model,
+                messages=self._build_messages(user_prompt),
+                temperature=self.settings.openai_temperature,
+                max_tokens=self.settings.openai_max_tokens,
+                stream=True,
+            )
+
+            async for event in response:
+                if not event.choices:
+                    continue
+                content = event.choices[0].delta.content
+                if content:
+                    parts.append(content)
+                    yield {"type": "delta", "content": content}
+
+            result = await self._build_result("".join(parts), await input_tokens_task)
+            result["sources_used"] = sources_used
+            if on_usage is not None:
+                await on_usage(result)
+            yield {"type": "result", **result}
+        finally:
+            # Runs on disconnects too; shielded so cleanup survives cancellation
+            with anyio.CancelScope(shield=True):
+                if response is None:
+                    input_tokens_task.cancel()
+                else:
+                    # Release the pooled HTTP/2 stream instead of waiting for GC
+                    await response.close()
+                    if result is None:
+                        result = await self._build_result(
+                            "".join(parts), await input_tokens_task
+                        )
+                        if on_usage is not None:
+                            await on_usage(result)
+
+
+@singleton
 def get_llm_service() -> LLMService:
     """Get or create LLM service instance."""
-    global _llm_service
-    if _llm_service is None:
-        _llm_service = LLMService()
-    return _llm_service
+    return LLMService()
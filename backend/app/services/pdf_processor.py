@@ -1,16 +1,225 @@
 """PDF processing service using pymupdf4llm."""
 
+import asyncio
+import os
 import re
 import uuid
-from io import BytesIO
-from typing import BinaryIO
-
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import accumulate, islice
+from typing import AsyncIterator, Generator, Iterable, Iterator, TypeVar
+
+import anyio
+import numpy as np
 import tiktoken
 import pymupdf4llm
 import pymupdf
 
+try:
+    from numba import njit
+except ImportError:
+    # Optional; chunk planning falls back to the pure-Python version
+    njit = None
+
 from ..config import get_settings, Settings
 from ..models.documents import Chunk, ProcessedDocument
+from ..utils.singleton import singleton
+
+_TOKENIZER = tiktoken.get_encoding("cl100k_base")
+# Page chunking threads (tiktoken releases the GIL while encoding)
+_TOKENIZER_THREADS = os.cpu_count() or 1
+# Sentence token counts kept across pages/documents; headers and
+# footers repeat on nearly every page
+TOKEN_CACHE_SIZE = 8192
+# Pages chunked concurrently while streaming a document
+PAGE_WINDOW = 16
+# Chunks handed to the embed/upsert pipeline at a time
+CHUNK_BATCH_SIZE = 64
+# Longest run treated as one sentence; unpunctuated PDF text (tables,
+# OCR output) is broken at word boundaries beyond this
+MAX_SENTENCE_CHARS = 2000
+
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+_HEADER_RE = re.compile(r'^#+\s+(.+?)$', re.MULTILINE)
+_BOLD_RE = re.compile(r'^\*\*(.+?)\*\*')
+
+
+T = TypeVar("T")
+
+
+def _batched(iterable: Iterable[T], n: int) -> Generator[list[T], None, None]:
+    """Yield lists of up to n items (itertools.batched needs Python 3.12)."""
+    it = iter(iterable)
+    while batch := list(islice(it, n)):
+        yield batch
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _token_len(text: str) -> int:
+    """Token length of a string, cached for repeated headers and words."""
+    # A string this short is one token or close enough for chunk sizing
+    if len(text) < 4:
+        return 1 if text else 0
+    return len(_TOKENIZER.encode_ordinary(text))
+
+
+def _plan_chunks_py(
+    token_counts: list[int],
+    max_tokens: int,
+    overlap_tokens: int,
+) -> list[tuple[int, int, int]]:
+    """
+    Plan chunk boundaries over per-sentence token counts.
+
+    Chunk ends and overlap starts are found by binary search over the
+    prefix sums. A sentence longer than max_tokens gets a chunk of its own.
+
+    Returns:
+        (start, end, token_count) rows; each chunk is sentences[start:end]
+    """
+    plan = []
+    # prefix[k] = tokens in sentences[:k]
+    prefix = [0, *accumulate(token_counts)]
+    n = len(token_counts)
+    i = 0
+
+    while i < n:
+        if token_counts[i] > max_tokens:
+            plan.append((i, i + 1, token_counts[i]))
+            i += 1
+            continue
+
+        # Largest j with sentences[i:j] fitting in max_tokens
+        j = bisect_right(prefix, prefix[i] + max_tokens, i + 1) - 1
+        plan.append((i, j, prefix[j] - prefix[i]))
+        if j >= n:
+            break
+
+        # Start next chunk with overlap - earliest k whose tail fits
+        k = bisect_left(prefix, prefix[j] - overlap_tokens, i + 1, j)
+        # Drop the overlap if it would crowd out the next sentence
+        if prefix[j + 1] - prefix[k] > max_tokens:
+            k = j
+        i = k
+
+    return plan
+
+
+def _plan_chunks_kernel(
+    token_counts: np.ndarray,
+    max_tokens: int,
+    overlap_tokens: int,
+) -> np.ndarray:
+    """_plan_chunks_py over an int64 array, written for numba's nopython mode."""
+    n = token_counts.shape[0]
+    prefix = np.zeros(n + 1, dtype=np.int64)
+    for k in range(n):
+        prefix[k + 1] = prefix[k] + token_counts[k]
+
+    # Every row advances the start by at least one sentence
+    plan = np.empty((n, 3), dtype=np.int64)
+    rows = 0
+    i = 0
+    while i < n:
+        if token_counts[i] > max_tokens:
+            plan[rows, 0] = i
+            plan[rows, 1] = i + 1
+            plan[rows, 2] = token_counts[i]
+            rows += 1
+            i += 1
+            continue
+
+        j = np.searchsorted(prefix, prefix[i] + max_tokens, side="right") - 1
+        plan[rows, 0] = i
+        plan[rows, 1] = j
+        plan[rows, 2] = prefix[j] - prefix[i]
+        rows += 1
+        if j >= n:
+            break
+
+        k = i + 1 + np.searchsorted(prefix[i + 1:j], prefix[j] - overlap_tokens, side="left")
+        if prefix[j + 1] - prefix[k] > max_tokens:
+            k = j
+        i = k
+
+    return plan[:rows]
+
+
+if njit is not None:
+    _plan_chunks_jit = njit(cache=True)(_plan_chunks_kernel)
+
+    def _plan_chunks(
+        token_counts: list[int],
+        max_tokens: int,
+        overlap_tokens: int,
+    ) -> list[tuple[int, int, int]]:
+        """Plan chunk boundaries with the compiled kernel."""
+        counts = np.asarray(token_counts, dtype=np.int64)
+        return [
+            tuple(row)
+            for row in _plan_chunks_jit(counts, max_tokens, overlap_tokens).tolist()
+        ]
+else:
+    _plan_chunks = _plan_chunks_py
+
+
+# Concurrent PDF conversions; each holds a worker thread and the parsed document
+_PDF_SEM = asyncio.Semaphore(min(4, os.cpu_count() or 1))
+
+# Shared across uploads; tiktoken releases the GIL while encoding
+_CHUNK_POOL = ThreadPoolExecutor(
+    max_workers=_TOKENIZER_THREADS,
+    thread_name_prefix="pdf-chunk",
+)
+
+
+def _chunk_page(
+    processor: "PDFProcessor",
+    doc_id: str,
+    title: str,
+    user_id: str,
+    page_num: int,
+    page_text: str,
+) -> tuple[str | None, list[Chunk]]:
+    """
+    Split, tokenize and chunk one page.
+
+    Returns:
+        Tuple of (detected section title, page chunks)
+    """
+    # Try to detect section title from page content
+    section_title = processor._extract_section_title(page_text)
+
+    # Split page into chunks
+    sentences = processor._split_sentences(page_text)
+    page_chunks = processor._split_into_chunks(
+        sentences,
+        processor.count_tokens_cached(sentences),
+        max_tokens=processor.settings.chunk_size_tokens,
+        overlap_tokens=processor.settings.chunk_overlap_tokens,
+    )
+
+    chunks = []
+    for i, (chunk_text, token_count) in enumerate(page_chunks):
+        # Sentences come from stripped page text, so no re-strip
+        if not chunk_text:
+            continue
+
+        chunks.append(
+            Chunk(
+                chunk_id=f"{doc_id}_p{page_num}_c{i}",
+                document_id=doc_id,
+                document_title=title,
+                user_id=user_id,
+                page_number=page_num,
+                section_title=section_title,
+                text=chunk_text,
+                token_count=token_count,
+            )
+        )
+
+    return section_title, chunks
 
 
 class PDFProcessor:
@@ -19,249 +228,318 @@ class PDFProcessor:
     def __init__(self, settings: Settings | None = None):
         """Initialize the PDF processor."""
         self.settings = settings or get_settings()
-        self.tokenizer = tiktoken.get_encoding("cl100k_base")
+        self.tokenizer = _TOKENIZER
 
-    def count_tokens(self, text: str) -> int:
-        """Count tokens in a text string."""
-        return len(self.tokenizer.encode(text))
+    def count_tokens_cached(self, texts: list[str]) -> list[int]:
+        """
+        Count tokens for many texts, each distinct string looked up once.
+
+        Lookups go through the shared _token_len cache, which is safe to
+        call from several chunking threads at once. Parallelism comes from
+        the per-page chunk jobs rather than a batched encode call.
+
+        Args:
+            texts: Strings to count
+
+        Returns:
+            Token counts in the same order as texts
+        """
+        counts = {text: _token_len(text) for text in dict.fromkeys(texts)}
+        return [counts[text] for text in texts]
+
+    @staticmethod
+    def _split_sentences(text: str) -> list[str]:
+        """Split text into sentences (rough approximation)."""
+        sentences = []
+        for sentence in _SENT_SPLIT.split(text):
+            if len(sentence) <= MAX_SENTENCE_CHARS:
+                sentences.append(sentence)
+                continue
+
+            # No usable punctuation; fall back to word-bounded pieces
+            piece: list[str] = []
+            piece_len = 0
+            for word in sentence.split():
+                if piece and piece_len + len(word) > MAX_SENTENCE_CHARS:
+                    sentences.append(' '.join(piece))
+                    piece = []
+                    piece_len = 0
+                piece.append(word)
+                piece_len += len(word) + 1
+            if piece:
+                sentences.append(' '.join(piece))
+        return sentences
 
     def _split_into_chunks(
         self,
-        text: str,
+        sentences: list[str],
+        token_counts: list[int],
         max_tokens: int,
         overlap_tokens: int,
-    ) -> list[str]:
+    ) -> list[tuple[str, int]]:
         """
-        Split text into chunks with overlap.
+        Split sentences into chunks with overlap.
 
-        Uses sentence boundaries when possible.
-        """
-        if not text.strip():
-            return []
+        Uses sentence boundaries when possible. token_counts holds the
+        precomputed count for each sentence; _plan_chunks turns them into
+        chunk boundaries and only the string joins happen here.
 
-        # Split into sentences (rough approximation)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        Returns:
+            (chunk_text, token_count) pairs, counted from the sentence totals
+        """
         chunks = []
-        current_chunk = []
-        current_tokens = 0
-
-        for sentence in sentences:
-            sentence_tokens = self.count_tokens(sentence)
-
-            # If single sentence is too long, split by characters
-            if sentence_tokens > max_tokens:
-                # Flush current chunk
-                if current_chunk:
-                    chunks.append(' '.join(current_chunk))
-                    current_chunk = []
-                    current_tokens = 0
-
-                # Split long sentence into smaller pieces
-                words = sentence.split()
-                temp_chunk = []
-                temp_tokens = 0
-                for word in words:
-                    word_tokens = self.count_tokens(word + ' ')
-                    if temp_tokens + word_tokens > max_tokens:
-                        if temp_chunk:
-                            chunks.append(' '.join(temp_chunk))
-                        temp_chunk = [word]
-                        temp_tokens = word_tokens
-                    else:
-                        temp_chunk.append(word)
-                        temp_tokens += word_tokens
-                if temp_chunk:
-                    current_chunk = temp_chunk
-                    current_tokens = temp_tokens
-            elif current_tokens + sentence_tokens > max_tokens:
-                # Start new chunk with overlap
-                chunks.append(' '.join(current_chunk))
-
-                # Calculate overlap - keep last few sentences
-                overlap_chunk = []
-                overlap_count = 0
-                for s in reversed(current_chunk):
-                    s_tokens = self.count_tokens(s)
-                    if overlap_count + s_tokens <= overlap_tokens:
-                        overlap_chunk.insert(0, s)
-                        overlap_count += s_tokens
-                    else:
-                        break
-
-                current_chunk = overlap_chunk + [sentence]
-                current_tokens = overlap_count + sentence_tokens
+        for start, end, tokens in _plan_chunks(token_counts, max_tokens, overlap_tokens):
+            # If single sentence is too long, split by token windows
+            if tokens > max_tokens:
+                chunks.extend(
+                    self._split_long_sentence(sentences[start], max_tokens, overlap_tokens)
+                )
             else:
-                current_chunk.append(sentence)
-                current_tokens += sentence_tokens
-
-        # Add final chunk
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
-
+                chunks.append((' '.join(sentences[start:end]), tokens))
         return chunks
 
+    def _split_long_sentence(
+        self,
+        sentence: str,
+        max_tokens: int,
+        overlap_tokens: int,
+    ) -> list[tuple[str, int]]:
+        """Split a sentence longer than max_tokens into overlapping token windows."""
+        # One encode for the whole sentence, then slice the token ids
+        ids = self.tokenizer.encode_ordinary(sentence)
+        token_bytes = self.tokenizer.decode_tokens_bytes(ids)
+        n = len(ids)
+
+        def starts_char(i: int) -> bool:
+            # A token whose first byte is a UTF-8 continuation byte continues
+            # a character begun by the token before it
+            return i >= n or not 0x80 <= token_bytes[i][0] < 0xC0
+
+        pieces = []
+        start = 0
+        while start < n:
+            # Window edges sit on character boundaries so decode never
+            # splits a multi-byte character
+            end = min(start + max_tokens, n)
+            while end > start + 1 and not starts_char(end):
+                end -= 1
+            window = ids[start:end]
+            pieces.append((self.tokenizer.decode(window).strip(), len(window)))
+            if end >= n:
+                break
+
+            start = max(start + 1, end - overlap_tokens)
+            while start < end and not starts_char(start):
+                start += 1
+        return pieces
+
     def _extract_section_title(self, text: str) -> str | None:
         """Extract section title from markdown-formatted text."""
         # Look for markdown headers
-        header_match = re.search(r'^#+\s+(.+?)$', text, re.MULTILINE)
+        header_match = _HEADER_RE.search(text)
         if header_match:
             return header_match.group(1).strip()
 
         # Look for bold text at start (often used as headers)
-        bold_match = re.search(r'^\*\*(.+?)\*\*', text)
+        bold_match = _BOLD_RE.search(text)
         if bold_match:
             return bold_match.group(1).strip()
 
         return None
 
-    def process_pdf(
-        self,
-        file_content: bytes,
-        filename: str,
-        user_id: str,
-        custom_title: str | None = None,
-    ) -> ProcessedDocument:
+    def _open_and_validate(self, file_content: bytes, filename: str) -> pymupdf.Document:
         """
-        Process a PDF file into chunks.
+        Open an upload as a PDF, checking it against the upload limits.
+
+        This is the only place an upload is parsed; aiter_process_pdf hands
+        the returned document straight to iter_process_pdf.
 
         Args:
             file_content: PDF file bytes
             filename: Original filename
-            user_id: Owner user ID
-            custom_title: Optional custom title
 
         Returns:
-            ProcessedDocument with chunks and metadata
+            The opened document; the caller is responsible for closing it
 
         Raises:
-            ValueError: If document exceeds page limits
+            ValueError: If the file is not an acceptable PDF
         """
-        doc_id = str(uuid.uuid4())
-        title = custom_title or filename.replace('.pdf', '').replace('_', ' ')
+        # Check file extension
+        if not filename.lower().endswith('.pdf'):
+            raise ValueError("Only PDF files are accepted")
+
+        # Check file size
+        size_mb = len(file_content) / (1024 * 1024)
+        if size_mb > self.settings.max_file_size_mb:
+            raise ValueError(
+                f"File too large ({size_mb:.1f}MB). Maximum: {self.settings.max_file_size_mb}MB"
+            )
+
+        # Open straight from the bytes (no BytesIO copy)
+        try:
+            doc = pymupdf.open(stream=file_content, filetype="pdf")
+        except Exception as e:
+            raise ValueError(f"Invalid PDF file: {str(e)}")
 
-        # Open PDF document
-        pdf_stream = BytesIO(file_content)
-        doc = pymupdf.open(stream=pdf_stream, filetype="pdf")
         page_count = len(doc)
+        if page_count == 0:
+            doc.close()
+            raise ValueError("PDF has no pages")
 
-        # Validate page limit
         if page_count > self.settings.max_pages_per_document:
             doc.close()
             raise ValueError(
-                f"Document has {page_count} pages, "
-                f"maximum allowed is {self.settings.max_pages_per_document}"
+                f"Document has {page_count} pages. "
+                f"Maximum: {self.settings.max_pages_per_document}"
             )
 
-        # Extract to markdown with page chunks using the document object
-        md_data = pymupdf4llm.to_markdown(
-            doc,
-            page_chunks=True,
-            write_images=False,
-        )
+        return doc
 
-        # Close document after extraction
-        doc.close()
+    def new_document(
+        self,
+        filename: str,
+        custom_title: str | None = None,
+        file_size_bytes: int | None = None,
+    ) -> ProcessedDocument:
+        """
+        Create the metadata record for an upload before it is processed.
 
-        chunks = []
-        sections_detected = set()
+        page_count and sections are filled in by iter_process_pdf.
+        """
+        return ProcessedDocument(
+            id=str(uuid.uuid4()),
+            title=custom_title or filename.replace('.pdf', '').replace('_', ' '),
+            page_count=0,
+            file_size_bytes=file_size_bytes,
+        )
 
-        for page_data in md_data:
-            # Get page number (1-indexed)
-            page_metadata = page_data.get("metadata", {})
-            page_num = page_metadata.get("page", 0) + 1
-            page_text = page_data.get("text", "")
+    def iter_process_pdf(
+        self,
+        doc: pymupdf.Document,
+        document: ProcessedDocument,
+        user_id: str,
+    ) -> Iterator[Chunk]:
+        """
+        Yield an opened PDF's chunks page by page.
 
-            if not page_text.strip():
-                continue
+        Args:
+            doc: Document from _open_and_validate; closed once extracted,
+                or by the caller if the iterator is never started
+            document: Metadata record; page_count is set up front and
+                sections accumulate as the iterator drains
+            user_id: Owner user ID
 
-            # Try to detect section title from page content
-            section_title = self._extract_section_title(page_text)
-            if section_title:
-                sections_detected.add(section_title)
+        Yields:
+            Chunks in page order
+        """
+        document.page_count = len(doc)
 
-            # Split page into chunks
-            page_chunks = self._split_into_chunks(
-                page_text,
-                max_tokens=self.settings.chunk_size_tokens,
-                overlap_tokens=self.settings.chunk_overlap_tokens,
+        # Extract to markdown with page chunks using the document object
+        try:
+            md_data = pymupdf4llm.to_markdown(
+                doc,
+                page_chunks=True,
+                write_images=False,
             )
+        finally:
+            # Close document after extraction
+            doc.close()
+
+        sections_detected = set(document.sections)
+
+        # Pages are independent, so each one is split, tokenized and chunked
+        # in its own pool job; windows bound how many chunks are held at once
+        for window in _batched(enumerate(md_data, start=1), PAGE_WINDOW):
+            jobs = []
+            for page_index, page_data in window:
+                # Get page number (1-indexed); it is part of the chunk IDs,
+                # so pages must never share one
+                page_metadata = page_data.get("metadata", {})
+                page_num = page_metadata.get("page_number", page_index)
+                page_text = page_data.get("text", "").strip()
 
-            for i, chunk_text in enumerate(page_chunks):
-                # Clean up the text
-                chunk_text = chunk_text.strip()
-                if not chunk_text:
+                if not page_text:
                     continue
 
-                chunk = Chunk(
-                    chunk_id=f"{doc_id}_p{page_num}_c{i}",
-                    document_id=doc_id,
-                    document_title=title,
-                    user_id=user_id,
-                    page_number=page_num,
-                    section_title=section_title,
-                    text=chunk_text,
-                    token_count=self.count_tokens(chunk_text),
+                jobs.append(
+                    _CHUNK_POOL.submit(
+                        _chunk_page, self, document.id, document.title, user_id,
+                        page_num, page_text,
+                    )
                 )
-                chunks.append(chunk)
 
-        return ProcessedDocument(
-            id=doc_id,
-            title=title,
-            page_count=page_count,
-            chunks=chunks,
-            sections=list(sections_detected),
-            file_size_bytes=len(file_content),
-        )
+            # Collect in submission order so chunks stay in page order
+            for job in jobs:
+                section_title, page_chunks = job.result()
+                if section_title and section_title not in sections_detected:
+                    sections_detected.add(section_title)
+                    document.sections.append(section_title)
+                yield from page_chunks
 
-    def validate_file(
+    async def aiter_process_pdf(
         self,
         file_content: bytes,
         filename: str,
-    ) -> tuple[bool, str]:
-        """
-        Validate a PDF file before processing.
-
-        Returns:
-            Tuple of (is_valid, error_message)
+        document: ProcessedDocument,
+        user_id: str,
+        batch_size: int = CHUNK_BATCH_SIZE,
+    ) -> AsyncIterator[list[Chunk]]:
         """
-        # Check file extension
-        if not filename.lower().endswith('.pdf'):
-            return False, "Only PDF files are accepted"
-
-        # Check file size
-        size_mb = len(file_content) / (1024 * 1024)
-        if size_mb > self.settings.max_file_size_mb:
-            return False, f"File too large ({size_mb:.1f}MB). Maximum: {self.settings.max_file_size_mb}MB"
-
-        # Try to open as PDF
-        try:
-            pdf_stream = BytesIO(file_content)
-            doc = pymupdf.open(stream=pdf_stream, filetype="pdf")
-            page_count = len(doc)
-            doc.close()
+        Validate and process an upload, yielding batches of chunks.
 
-            if page_count > self.settings.max_pages_per_document:
-                return False, (
-                    f"Document has {page_count} pages. "
-                    f"Maximum: {self.settings.max_pages_per_document}"
-                )
-
-            if page_count == 0:
-                return False, "PDF has no pages"
-
-        except Exception as e:
-            return False, f"Invalid PDF file: {str(e)}"
+        Parsing and chunking run in worker threads, so the event loop is
+        never blocked. At most a few uploads are processed at once and
+        further uploads wait their turn.
 
-        return True, "OK"
+        Args:
+            file_content: PDF file bytes
+            filename: Original filename
+            document: Metadata record from new_document
+            user_id: Owner user ID
+            batch_size: Chunks per yielded batch
 
+        Yields:
+            Lists of up to batch_size chunks, in page order
 
-# Singleton instance
-_processor: PDFProcessor | None = None
+        Raises:
+            ValueError: If the file is not an acceptable PDF or fails to process
+        """
+        async with _PDF_SEM:
+            doc = await asyncio.to_thread(self._open_and_validate, file_content, filename)
+            batches = _batched(self.iter_process_pdf(doc, document, user_id), batch_size)
+            pending: asyncio.Future | None = None
+            try:
+                while True:
+                    # Shielded so a cancelled caller can still wait for the
+                    # worker thread, which keeps running either way
+                    pending = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                    try:
+                        batch = await asyncio.shield(pending)
+                    except ValueError:
+                        raise
+                    except Exception as e:
+                        raise ValueError(f"Failed to process PDF: {str(e)}") from e
+                    if batch is None:
+                        break
+                    yield batch
+            finally:
+                # The document is only touched from worker threads, and only
+                # once the in-flight extraction step has finished
+                with anyio.CancelScope(shield=True):
+                    if pending is not None and not pending.done():
+                        await asyncio.wait([pending])
+                    await asyncio.to_thread(self._close_run, batches, doc)
+
+    @staticmethod
+    def _close_run(batches: Generator[list[Chunk], None, None], doc: pymupdf.Document) -> None:
+        """Close a processing run's iterator and document, off the event loop."""
+        batches.close()
+        # Abandoned before extraction started
+        if not doc.is_closed:
+            doc.close()
 
 
+@singleton
 def get_pdf_processor() -> PDFProcessor:
     """Get or create PDF processor instance."""
-    global _processor
-    if _processor is None:
-        _processor = PDFProcessor()
-    return _processor
+    return PDFProcessor()
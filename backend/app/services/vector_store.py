@@ -1,14 +1,21 @@
 """Vector store service using Qdrant Cloud."""
 
+import os
 import uuid
+from datetime import datetime, timezone
 from typing import Any
 
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qdrant_models
 from qdrant_client.http.exceptions import UnexpectedResponse
 
 from ..config import get_settings, Settings
-from ..models.documents import Chunk, StoredDocument
+from ..models.documents import Chunk, ProcessedDocument, StoredDocument
+from ..utils.singleton import singleton
+
+# Point IDs are derived from chunk_id, so re-upserting a chunk overwrites it
+_CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "legal-rag:chunk")
 
 
 class VectorStoreService:
@@ -17,14 +24,27 @@ class VectorStoreService:
     # Embedding dimension for all-MiniLM-L6-v2
     EMBEDDING_DIMENSION = 384
 
+    # Truncation length for the precomputed preview payload field
+    PREVIEW_CHARS = 100
+
+    # Points per upsert request
+    UPSERT_BATCH_SIZE = 256
+
+    # Candidate list size per query (recall vs latency)
+    SEARCH_HNSW_EF = 64
+
     def __init__(self, settings: Settings | None = None):
         """Initialize connection to Qdrant Cloud."""
         self.settings = settings or get_settings()
         self.client = QdrantClient(
             url=self.settings.qdrant_url,
             api_key=self.settings.qdrant_api_key,
+            # gRPC sends vectors as packed floats instead of JSON numbers
+            prefer_grpc=True,
         )
         self.collection_name = self.settings.qdrant_collection_name
+        # One vectorless point per document, so listings don't scan chunks
+        self.documents_collection_name = f"{self.collection_name}_documents"
         self._ensure_collection()
 
     def _ensure_collection(self) -> None:
@@ -40,7 +60,24 @@ class VectorStoreService:
                 vectors_config=qdrant_models.VectorParams(
                     size=self.EMBEDDING_DIMENSION,
                     distance=qdrant_models.Distance.COSINE,
+                    # Full-precision vectors are only read for rescoring
+                    on_disk=True,
+                ),
+                # int8 copies stay in RAM and serve the HNSW search
+                quantization_config=qdrant_models.ScalarQuantization(
+                    scalar=qdrant_models.ScalarQuantizationConfig(
+                        type=qdrant_models.ScalarType.INT8,
+                        quantile=0.99,
+                        always_ram=True,
+                    ),
                 ),
+                hnsw_config=qdrant_models.HnswConfigDiff(m=16, ef_construct=128),
+                # Roughly one segment per pair of cores for parallel search
+                optimizers_config=qdrant_models.OptimizersConfigDiff(
+                    default_segment_number=(os.cpu_count() or 2) // 2 or 1,
+                ),
+                # Payloads carry full chunk text; read from disk only for hits
+                on_disk_payload=True,
             )
 
         # Always try to create payload indexes (idempotent operation)
@@ -55,6 +92,138 @@ class VectorStoreService:
                 # Index might already exist, which is fine
                 pass
 
+        self._ensure_documents_collection(backfill=collection_exists)
+
+    def _ensure_documents_collection(self, backfill: bool) -> None:
+        """
+        Ensure the per-document metadata collection exists.
+
+        documents_collection_name is an alias over a versioned backing
+        collection. The alias is created only after the backing collection
+        is fully populated, so its presence marks a completed setup. An
+        existing backing collection is reused, never deleted; the backfill
+        upserts are idempotent, so an interrupted one is simply redone on
+        next start.
+
+        Assumes a single worker runs this setup (e.g. the first replica to
+        start). Concurrent setups don't lose data, but a slower worker's
+        backfill can overwrite metadata that a faster one has since
+        recorded for a new upload.
+        """
+        if self._documents_alias_exists():
+            return
+
+        backing_name = f"{self.documents_collection_name}_v1"
+        if not self.client.collection_exists(backing_name):
+            try:
+                self.client.create_collection(
+                    collection_name=backing_name,
+                    vectors_config={},
+                )
+            except Exception:
+                # Created concurrently; reuse it
+                if not self.client.collection_exists(backing_name):
+                    raise
+        try:
+            self.client.create_payload_index(
+                collection_name=backing_name,
+                field_name="user_id",
+                field_schema=qdrant_models.PayloadSchemaType.KEYWORD,
+            )
+        except Exception:
+            # Index might already exist, which is fine
+            pass
+
+        # Documents indexed before this collection existed
+        if backfill:
+            self._backfill_documents(backing_name)
+
+        try:
+            self.client.update_collection_aliases(
+                change_aliases_operations=[
+                    qdrant_models.CreateAliasOperation(
+                        create_alias=qdrant_models.CreateAlias(
+                            collection_name=backing_name,
+                            alias_name=self.documents_collection_name,
+                        )
+                    )
+                ]
+            )
+        except Exception:
+            # Another worker finished setup first
+            if not self._documents_alias_exists():
+                raise
+
+    def _documents_alias_exists(self) -> bool:
+        """Check whether the documents collection setup has completed."""
+        aliases = self.client.get_aliases().aliases
+        return any(alias.alias_name == self.documents_collection_name for alias in aliases)
+
+    def _backfill_documents(self, target_collection: str) -> None:
+        """Rebuild document metadata points from the chunks collection."""
+        documents: dict[str, dict[str, Any]] = {}
+        backfilled_at = datetime.now(timezone.utc).isoformat()
+        # Sets while aggregating; converted to lists for the payload
+        sections_by_doc: dict[str, set[str]] = {}
+
+        offset = None
+        while True:
+            results, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=100,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+
+            if not results:
+                break
+
+            for point in results:
+                payload = point.payload
+                doc_id = payload.get("document_id")
+                if not doc_id:
+                    # Not addressable as a document; nothing to list
+                    continue
+
+                if doc_id not in documents:
+                    documents[doc_id] = {
+                        "document_id": doc_id,
+                        "user_id": payload.get("user_id"),
+                        "title": payload.get("document_title", "Unknown"),
+                        "page_count": 0,
+                        "chunk_count": 0,
+                        # Upload time isn't on the chunks; a fixed value keeps
+                        # listings (and their ETags) stable
+                        "uploaded_at": backfilled_at,
+                    }
+                    sections_by_doc[doc_id] = set()
+
+                doc = documents[doc_id]
+                doc["chunk_count"] += 1
+                page_num = payload.get("page_number", 0)
+                if page_num > doc["page_count"]:
+                    doc["page_count"] = page_num
+
+                section = payload.get("section_title")
+                if section:
+                    sections_by_doc[doc_id].add(section)
+
+            if offset is None:
+                break
+
+        for doc_id, doc in documents.items():
+            doc["sections"] = list(sections_by_doc[doc_id])
+
+        if documents:
+            self.client.upsert(
+                collection_name=target_collection,
+                points=[
+                    qdrant_models.PointStruct(id=doc_id, vector={}, payload=doc)
+                    for doc_id, doc in documents.items()
+                ],
+            )
+
     def is_healthy(self) -> bool:
         """Check if Qdrant is accessible."""
         try:
@@ -66,14 +235,14 @@ class VectorStoreService:
     def add_chunks(
         self,
         chunks: list[Chunk],
-        embeddings: list[list[float]],
+        embeddings: np.ndarray | list[list[float]],
     ) -> int:
         """
         Add document chunks with their embeddings to the vector store.
 
         Args:
             chunks: List of document chunks
-            embeddings: Corresponding embedding vectors
+            embeddings: Corresponding embedding vectors, one row per chunk
 
         Returns:
             Number of chunks added
@@ -84,38 +253,87 @@ class VectorStoreService:
         if not chunks:
             return 0
 
-        points = [
-            qdrant_models.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=embedding,
-                payload={
-                    "chunk_id": chunk.chunk_id,
-                    "document_id": chunk.document_id,
-                    "document_title": chunk.document_title,
-                    "user_id": chunk.user_id,
-                    "page_number": chunk.page_number,
-                    "section_title": chunk.section_title,
-                    "text": chunk.text,
-                    "token_count": chunk.token_count,
-                },
-            )
-            for chunk, embedding in zip(chunks, embeddings)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        ids = [str(uuid.uuid5(_CHUNK_ID_NAMESPACE, chunk.chunk_id)) for chunk in chunks]
+        payloads = [
+            {
+                "chunk_id": chunk.chunk_id,
+                "document_id": chunk.document_id,
+                "document_title": chunk.document_title,
+                "user_id": chunk.user_id,
+                "page_number": chunk.page_number,
+                "section_title": chunk.section_title,
+                "text": chunk.text,
+                "token_count": chunk.token_count,
+                # Precomputed so read paths don't re-slice on every request
+                "preview_100": (
+                    chunk.text[:self.PREVIEW_CHARS] + "..."
+                    if len(chunk.text) > self.PREVIEW_CHARS
+                    else chunk.text
+                ),
+            }
+            for chunk in chunks
         ]
 
+        # Column-oriented batches; large uploads go in bounded requests
+        for start in range(0, len(ids), self.UPSERT_BATCH_SIZE):
+            end = start + self.UPSERT_BATCH_SIZE
+            self.client.upsert(
+                collection_name=self.collection_name,
+                points=qdrant_models.Batch(
+                    ids=ids[start:end],
+                    vectors=vectors[start:end].tolist(),
+                    payloads=payloads[start:end],
+                ),
+            )
+
+        return len(ids)
+
+    def add_document(
+        self,
+        document: ProcessedDocument,
+        user_id: str,
+        chunk_count: int | None = None,
+    ) -> None:
+        """
+        Record document-level metadata once all of its chunks are stored.
+
+        Args:
+            document: The processed document
+            user_id: Owner user ID
+            chunk_count: Chunks stored, when they were streamed rather than
+                kept on document.chunks
+        """
         self.client.upsert(
-            collection_name=self.collection_name,
-            points=points,
+            collection_name=self.documents_collection_name,
+            points=[
+                qdrant_models.PointStruct(
+                    id=document.id,
+                    vector={},
+                    payload={
+                        "document_id": document.id,
+                        "user_id": user_id,
+                        "title": document.title,
+                        "page_count": document.page_count,
+                        "chunk_count": (
+                            len(document.chunks) if chunk_count is None else chunk_count
+                        ),
+                        "sections": document.sections,
+                        "file_size_bytes": document.file_size_bytes,
+                        "uploaded_at": document.uploaded_at.isoformat(),
+                    },
+                )
+            ],
         )
 
-        return len(points)
-
     def search(
         self,
-        query_embedding: list[float],
+        query_embedding: np.ndarray | list[float],
         user_id: str,
         limit: int = 5,
         document_ids: list[str] | None = None,
         min_score: float = 0.5,
+        include_fields: list[str] | None = None,
     ) -> list[dict[str, Any]]:
         """
         Fast search for similar chunks.
@@ -126,6 +344,7 @@ class VectorStoreService:
             limit: Maximum results to return
             document_ids: Optional filter to specific documents
             min_score: Minimum relevance score
+            include_fields: Payload fields to return; all fields if None
 
         Returns:
             List of matching chunks with scores
@@ -154,27 +373,36 @@ class VectorStoreService:
             should=should_conditions if should_conditions else None,
         )
 
-        # Single fast query
+        # Single fast query; min_score is applied server-side
         results = self.client.query_points(
             collection_name=self.collection_name,
             query=query_embedding,
-            limit=limit * 2,  # Get extra to filter
+            limit=limit,
             query_filter=query_filter,
-            with_payload=True,
+            score_threshold=min_score,
+            with_payload=(
+                qdrant_models.PayloadSelectorInclude(include=include_fields)
+                if include_fields
+                else True
+            ),
+            # Rescore the quantized candidates with the original vectors
+            search_params=qdrant_models.SearchParams(
+                hnsw_ef=self.SEARCH_HNSW_EF,
+                quantization=qdrant_models.QuantizationSearchParams(
+                    rescore=True,
+                    oversampling=2.0,
+                ),
+            ),
         )
 
-        # Filter by min_score
-        filtered = [
+        return [
             {
                 "score": hit.score,
                 **hit.payload,
             }
             for hit in results.points
-            if hit.score >= min_score
         ]
 
-        return filtered[:limit]
-
     def get_document_chunks(self, document_id: str, user_id: str | None = None) -> list[dict[str, Any]]:
         """Get all chunks for a specific document, optionally filtered by user_id."""
         must_conditions = [
@@ -202,6 +430,26 @@ class VectorStoreService:
 
         return [point.payload for point in results]
 
+    def document_exists(self, document_id: str, user_id: str) -> bool:
+        """Check whether a document's metadata point exists for a user."""
+        found = self.client.count(
+            collection_name=self.documents_collection_name,
+            count_filter=qdrant_models.Filter(
+                must=[
+                    qdrant_models.FieldCondition(
+                        key="document_id",
+                        match=qdrant_models.MatchValue(value=document_id),
+                    ),
+                    qdrant_models.FieldCondition(
+                        key="user_id",
+                        match=qdrant_models.MatchValue(value=user_id),
+                    ),
+                ]
+            ),
+            exact=True,
+        ).count
+        return found > 0
+
     def delete_by_document(self, document_id: str, user_id: str) -> int:
         """
         Delete all chunks for a document belonging to a user.
@@ -209,92 +457,84 @@ class VectorStoreService:
         Returns:
             Number of chunks deleted
         """
-        # Count before deletion (filtered by user_id)
-        chunks = self.get_document_chunks(document_id, user_id)
-        count = len(chunks)
-
-        if count > 0:
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=qdrant_models.FilterSelector(
-                    filter=qdrant_models.Filter(
-                        must=[
-                            qdrant_models.FieldCondition(
-                                key="document_id",
-                                match=qdrant_models.MatchValue(value=document_id),
-                            ),
-                            qdrant_models.FieldCondition(
-                                key="user_id",
-                                match=qdrant_models.MatchValue(value=user_id),
-                            ),
-                        ]
-                    )
+        document_filter = qdrant_models.Filter(
+            must=[
+                qdrant_models.FieldCondition(
+                    key="document_id",
+                    match=qdrant_models.MatchValue(value=document_id),
                 ),
-            )
+                qdrant_models.FieldCondition(
+                    key="user_id",
+                    match=qdrant_models.MatchValue(value=user_id),
+                ),
+            ]
+        )
+
+        # Count before deletion; Qdrant's delete result carries no count
+        count = self.client.count(
+            collection_name=self.collection_name,
+            count_filter=document_filter,
+            exact=True,
+        ).count
+
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=qdrant_models.FilterSelector(filter=document_filter),
+        )
+
+        self.client.delete(
+            collection_name=self.documents_collection_name,
+            points_selector=qdrant_models.FilterSelector(filter=document_filter),
+        )
 
         return count
 
+    def _user_filter(self, user_id: str | None) -> qdrant_models.Filter | None:
+        """Build a user_id filter, or None for all users."""
+        if not user_id:
+            return None
+        return qdrant_models.Filter(
+            must=[
+                qdrant_models.FieldCondition(
+                    key="user_id",
+                    match=qdrant_models.MatchValue(value=user_id),
+                )
+            ]
+        )
+
     def get_all_documents(self, user_id: str | None = None) -> list[StoredDocument]:
         """Get metadata for all stored documents, optionally filtered by user_id."""
-        # Scroll through all points to get unique documents
-        documents: dict[str, StoredDocument] = {}
-
-        scroll_filter = None
-        if user_id:
-            scroll_filter = qdrant_models.Filter(
-                must=[
-                    qdrant_models.FieldCondition(
-                        key="user_id",
-                        match=qdrant_models.MatchValue(value=user_id),
-                    )
-                ]
-            )
+        documents: list[StoredDocument] = []
 
         offset = None
         while True:
             results, offset = self.client.scroll(
-                collection_name=self.collection_name,
-                scroll_filter=scroll_filter,
+                collection_name=self.documents_collection_name,
+                scroll_filter=self._user_filter(user_id),
                 limit=100,
                 offset=offset,
                 with_payload=True,
                 with_vectors=False,
             )
 
-            if not results:
-                break
-
-            for point in results:
-                payload = point.payload
-                doc_id = payload.get("document_id")
-
-                if doc_id not in documents:
-                    documents[doc_id] = StoredDocument(
-                        id=doc_id,
-                        title=payload.get("document_title", "Unknown"),
-                        page_count=0,
-                        chunk_count=0,
-                        sections=[],
-                    )
-
-                doc = documents[doc_id]
-                doc.chunk_count += 1
-                page_num = payload.get("page_number", 0)
-                if page_num > doc.page_count:
-                    doc.page_count = page_num
-
-                section = payload.get("section_title")
-                if section and section not in doc.sections:
-                    doc.sections.append(section)
+            # Payload keys mirror the StoredDocument fields
+            documents.extend(
+                StoredDocument.model_validate({**point.payload, "id": point.payload["document_id"]})
+                for point in results
+            )
 
             if offset is None:
                 break
 
-        return list(documents.values())
+        return documents
 
     def get_document_count(self, user_id: str | None = None) -> int:
         """Get the number of unique documents stored, optionally filtered by user_id."""
-        return len(self.get_all_documents(user_id))
+        return self.client.count(
+            collection_name=self.documents_collection_name,
+            count_filter=self._user_filter(user_id),
+            exact=True,
+        ).count
 
     def get_total_chunk_count(self) -> int:
         """Get total number of chunks stored."""
@@ -302,13 +542,7 @@ class VectorStoreService:
         return info.points_count or 0
 
 
-# Singleton instance
-_vector_store: VectorStoreService | None = None
-
-
+@singleton
 def get_vector_store() -> VectorStoreService:
     """Get or create vector store instance."""
-    global _vector_store
-    if _vector_store is None:
-        _vector_store = VectorStoreService()
-    return _vector_store
+    return VectorStoreService()
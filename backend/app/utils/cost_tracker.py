@@ -1,26 +1,59 @@
 """Cost and usage tracking utility."""
 
+import asyncio
 from datetime import date, datetime
 from typing import Any
 
+import redis
+
 from ..config import get_settings, Settings
+from .redis_client import get_redis
+from .singleton import singleton
 
 
 class CostTracker:
     """Track API usage and enforce cost limits."""
 
+    # Daily usage hashes outlive their day so late reads still see them
+    USAGE_TTL_SECONDS = 48 * 3600
+
     def __init__(self, settings: Settings | None = None):
         """Initialize cost tracker."""
         self.settings = settings or get_settings()
         self._daily_usage: dict[str, dict[str, Any]] = {}
+        # Shared across workers when configured; the dict above is the
+        # fallback for single-process setups and Redis outages
+        self._redis = get_redis(self.settings)
 
     def _get_today_key(self) -> str:
         """Get today's date as string key."""
         return date.today().isoformat()
 
+    def _redis_key(self, today: str) -> str:
+        """Redis hash holding one day's usage."""
+        return f"usage:{today}"
+
+    @staticmethod
+    def _parse_usage(raw: dict[bytes, bytes]) -> dict[str, Any]:
+        """Convert a Redis usage hash into a usage record."""
+        fields = {k.decode(): v.decode() for k, v in raw.items()}
+        return {
+            "queries": int(fields.get("queries", 0)),
+            "input_tokens": int(fields.get("input_tokens", 0)),
+            "output_tokens": int(fields.get("output_tokens", 0)),
+            "cost_usd": float(fields.get("cost_usd", 0.0)),
+            "started_at": fields.get("started_at", datetime.utcnow().isoformat()),
+        }
+
     def _get_today_usage(self) -> dict[str, Any]:
         """Get or create today's usage record."""
         today = self._get_today_key()
+        if self._redis is not None:
+            try:
+                return self._parse_usage(self._redis.hgetall(self._redis_key(today)))
+            except redis.RedisError:
+                pass
+
         if today not in self._daily_usage:
             self._daily_usage[today] = {
                 "queries": 0,
@@ -65,6 +98,29 @@ class CostTracker:
         Returns:
             Updated daily usage stats
         """
+        if self._redis is not None:
+            # Atomic increments keep limits correct across workers
+            key = self._redis_key(self._get_today_key())
+            try:
+                pipe = self._redis.pipeline()
+                pipe.hsetnx(key, "started_at", datetime.utcnow().isoformat())
+                pipe.hincrby(key, "queries", 1)
+                pipe.hincrby(key, "input_tokens", input_tokens)
+                pipe.hincrby(key, "output_tokens", output_tokens)
+                pipe.hincrbyfloat(key, "cost_usd", cost_usd)
+                pipe.expire(key, self.USAGE_TTL_SECONDS)
+                pipe.hget(key, "started_at")
+                results = pipe.execute()
+                return {
+                    "queries": results[1],
+                    "input_tokens": results[2],
+                    "output_tokens": results[3],
+                    "cost_usd": float(results[4]),
+                    "started_at": results[6].decode(),
+                }
+            except redis.RedisError:
+                pass
+
         usage = self._get_today_usage()
         usage["queries"] += 1
         usage["input_tokens"] += input_tokens
@@ -86,20 +142,43 @@ class CostTracker:
             },
         }
 
+    async def _call(self, method, *args, **kwargs):
+        """Run a method off the event loop when it talks to Redis."""
+        # The dict-only path is cheap and stays on the loop (single-threaded)
+        if self._redis is None:
+            return method(*args, **kwargs)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def acan_process_query(self) -> tuple[bool, str]:
+        """Async variant of can_process_query for request handlers."""
+        return await self._call(self.can_process_query)
+
+    async def atrack_query(
+        self,
+        input_tokens: int,
+        output_tokens: int,
+        cost_usd: float,
+    ) -> dict[str, Any]:
+        """Async variant of track_query for request handlers."""
+        return await self._call(self.track_query, input_tokens, output_tokens, cost_usd)
+
+    async def aget_usage_stats(self) -> dict[str, Any]:
+        """Async variant of get_usage_stats for request handlers."""
+        return await self._call(self.get_usage_stats)
+
     def reset_daily_usage(self) -> None:
         """Reset today's usage (for testing)."""
         today = self._get_today_key()
+        if self._redis is not None:
+            try:
+                self._redis.delete(self._redis_key(today))
+            except redis.RedisError:
+                pass
         if today in self._daily_usage:
             del self._daily_usage[today]
 
 
-# Singleton instance
-_cost_tracker: CostTracker | None = None
-
-
+@singleton
 def get_cost_tracker() -> CostTracker:
     """Get or create cost tracker instance."""
-    global _cost_tracker
-    if _cost_tracker is None:
-        _cost_tracker = CostTracker()
-    return _cost_tracker
+    return CostTracker()
@@ -0,0 +1,30 @@
+"""Shared Redis client factory."""
+
+from functools import cache
+
+import redis
+
+from ..config import get_settings, Settings
+
+
+@cache
+def _redis_client(url: str, timeout_seconds: float) -> redis.Redis:
+    """Create one pooled client per URL."""
+    return redis.Redis.from_url(
+        url,
+        socket_timeout=timeout_seconds,
+        socket_connect_timeout=timeout_seconds,
+    )
+
+
+def get_redis(settings: Settings | None = None) -> redis.Redis | None:
+    """
+    Get the shared Redis client, or None when REDIS_URL is unset.
+
+    Timeouts are short so an unreachable Redis raises RedisError quickly
+    and callers fall back to their in-process state.
+    """
+    settings = settings or get_settings()
+    if not settings.redis_url:
+        return None
+    return _redis_client(settings.redis_url, settings.redis_timeout_seconds)
@@ -0,0 +1,31 @@
+"""Lazily built, process-wide service instances."""
+
+import threading
+from collections.abc import Callable
+from functools import wraps
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+def singleton(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Cache a zero-argument factory's result, building it at most once.
+
+    Factories are called from worker threads (health probes, startup) as
+    well as the event loop. functools.cache lets concurrent first calls
+    each run the factory, so construction is serialized with a lock. A
+    factory that raises is retried on the next call.
+    """
+    lock = threading.Lock()
+    instance: list[T] = []
+
+    @wraps(factory)
+    def get() -> T:
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    return get
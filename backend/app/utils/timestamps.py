@@ -0,0 +1,24 @@
+"""Cheap, coarse-grained timestamps for high-frequency endpoints."""
+
+import time
+from datetime import datetime, timezone
+
+# Maximum age of the cached timestamp in seconds
+_MAX_AGE = 1.0
+
+# [monotonic time of last refresh, cached datetime]
+_TS_CACHE: list = [float("-inf"), None]
+
+
+def utcnow_cached() -> datetime:
+    """
+    Get the current UTC time, refreshed at most once per second.
+
+    Use for responses where up to one second of staleness is acceptable,
+    such as health probes.
+    """
+    now = time.monotonic()
+    if now - _TS_CACHE[0] >= _MAX_AGE:
+        _TS_CACHE[0] = now
+        _TS_CACHE[1] = datetime.now(timezone.utc)
+    return _TS_CACHE[1]
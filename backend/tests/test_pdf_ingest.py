@@ -0,0 +1,71 @@
+"""Ingest a multi-page PDF into an in-memory Qdrant and check what was stored."""
+
+import asyncio
+
+import pymupdf
+import pytest
+from qdrant_client import QdrantClient
+
+from app.config import Settings
+from app.services import vector_store as vector_store_module
+from app.services.pdf_processor import PDFProcessor
+from app.services.vector_store import VectorStoreService
+
+PAGES = 12
+
+
+@pytest.fixture
+def settings() -> Settings:
+    return Settings(
+        api_key="test",
+        app_password="test",
+        openai_api_key="test",
+        qdrant_url="http://localhost:6333",
+        qdrant_api_key="test",
+        chunk_size_tokens=60,
+        chunk_overlap_tokens=10,
+    )
+
+
+@pytest.fixture
+def vector_store(settings, monkeypatch) -> VectorStoreService:
+    monkeypatch.setattr(
+        vector_store_module, "QdrantClient", lambda **kwargs: QdrantClient(":memory:")
+    )
+    return VectorStoreService(settings)
+
+
+def _multi_page_pdf() -> bytes:
+    doc = pymupdf.open()
+    for page_num in range(1, PAGES + 1):
+        page = doc.new_page()
+        text = " ".join(
+            f"Clause {page_num}.{i} binds the parties to term {i}." for i in range(12)
+        )
+        page.insert_textbox(pymupdf.Rect(72, 72, 540, 770), text)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+async def _ingest(processor, vector_store, content, document, user_id) -> int:
+    chunk_count = 0
+    async for batch in processor.aiter_process_pdf(content, "contract.pdf", document, user_id):
+        embeddings = [[1.0] + [0.0] * (vector_store.EMBEDDING_DIMENSION - 1)] * len(batch)
+        chunk_count += vector_store.add_chunks(batch, embeddings)
+    return chunk_count
+
+
+def test_multi_page_upload_stores_every_chunk(settings, vector_store):
+    processor = PDFProcessor(settings)
+    document = processor.new_document("contract.pdf")
+
+    chunk_count = asyncio.run(
+        _ingest(processor, vector_store, _multi_page_pdf(), document, "user-1")
+    )
+
+    chunks = vector_store.get_document_chunks(document.id, "user-1")
+    assert chunk_count > PAGES
+    assert vector_store.get_total_chunk_count() == chunk_count
+    assert len(chunks) == chunk_count
+    assert {chunk["page_number"] for chunk in chunks} == set(range(1, PAGES + 1))